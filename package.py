@@ -2,6 +2,2764 @@ import argparse
 import subprocess
 import os
 import platform
+import sys
+import json
+import time
+import shutil
+import ast
+import re
+import fnmatch
+import py_compile
+import importlib.util
+import hashlib
+import inspect
+import csv
+import itertools
+import threading
+import signal
+import importlib.metadata
+import asyncio
+import ctypes
+import ctypes.util
+import struct
+import shlex
+import tarfile
+import gzip
+import mmap
+import dataclasses
+import concurrent.futures
+import functools
+import sysconfig
+from typing import Dict, List, Optional
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Default upper bound for the build cache (5 GB)
+DEFAULT_CACHE_MAX_SIZE = 5 * 1024 * 1024 * 1024
+
+# Stores of individually cached files inside the build cache (evicted together with its entries),
+# and their labels in the cache statistics
+CACHE_OBJECT_STORES = {'compressed': 'Binaries', 'pyc': 'Bytecode'}
+
+# First PyInstaller release with the --optimize option
+PYINSTALLER_OPTIMIZE_VERSION = (6, 6)
+
+# Serializes updates of the build cache counters between threads
+_STATS_LOCK = threading.Lock()
+
+# Directories and file suffixes that never contribute to a build's inputs
+CACHE_SKIP_DIRS = {'__pycache__', '.git', '.hg', '.svn', '.tox', '.nox', '.venv', 'venv'}
+CACHE_SKIP_SUFFIXES = ('.pyc', '.pyo', '.spec')
+
+# Options holding PyInstaller 'source:destination' data specifications
+DATA_SPEC_OPTIONS = ('include', 'binaries', 'additional_files', 'resource_files')
+
+# Options naming files or directories PyInstaller reads; their contents are build inputs
+INPUT_PATH_OPTIONS = (
+    'icon', 'version', 'license', 'hooks', 'bootloader', 'manifest', 'splash', 'runtime_hooks', 'eula',
+    'runtime_hook_spec', 'template', 'icon_mac', 'custom_hooks', 'bootloader_conf', 'bundled_icon', 'upx_conf',
+    'user_hooks', 'custom_library',
+)
+
+# PyInstaller log lines that mark the start of a build phase. UPX runs are only
+# logged individually at DEBUG level (--verbose); otherwise they count towards EXE/COLLECT.
+PHASE_PATTERN = re.compile(r'\b(?:checking|Building|Running) (Analysis|PYZ|PKG|EXE|COLLECT|BUNDLE|MERGE)\b')
+UPX_PATTERN = re.compile(r'Executing\b.*\bupx\b', re.IGNORECASE)
+
+# Slotted dataclasses need Python 3.10+
+DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# One line of python -X importtime output: self and cumulative microseconds, indented module name
+IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+
+# Modules costing less than this (median cumulative microseconds) get no suggestion
+DEFAULT_MIN_IMPORT_COST = 5000
+
+# Runtime hook importing slow modules in the background while the application starts
+PREWARM_HOOK = """# Generated by package.py --profile-imports: pre-warms slow imports in a background thread
+import importlib
+import threading
+
+
+def _prewarm():
+    for name in {modules!r}:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+
+threading.Thread(target=_prewarm, name="prewarm-imports", daemon=True).start()
+"""
+
+# inotify event masks (see inotify(7))
+IN_ATTRIB, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO = 0x4, 0x8, 0x40, 0x80
+IN_CREATE, IN_DELETE, IN_Q_OVERFLOW, IN_ISDIR = 0x100, 0x200, 0x4000, 0x40000000
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# Editor swap and backup files that never trigger a rebuild
+WATCH_IGNORED_PATTERNS = ('.#*', '*~', '*.swp', '*.swx', '*.tmp', '4913')
+
+# Launcher of lazy onefile executables: the gzipped tar payload after it is unpacked
+# once into a content-hashed per-user cache directory and reused by later launches
+LAZY_LAUNCHER = """#!/bin/sh
+# kpypackager lazy onefile: {entry}
+cache="${{XDG_CACHE_HOME:-$HOME/.cache}}/kpypackager/lazy"
+dir="$cache"/{entry}
+if [ ! -d "$dir" ]; then
+    # The unpacked tree may have been deleted while its symlink was left behind
+    if [ -L "$dir" ]; then
+        rm -f "$dir"
+    fi
+    mkdir -p "$cache" && tmp=$(mktemp -d "$dir.XXXXXX") || exit 1
+    if tail -c +{offset} "$0" | tar -xzf - -C "$tmp"; then
+        # The symlink appears atomically, so concurrent first launches never see a partial tree
+        ln -sn "${{tmp##*/}}" "$dir" 2>/dev/null || rm -rf "$tmp"
+    else
+        rm -rf "$tmp"
+        echo "$0: failed to unpack into $cache" >&2
+        exit 1
+    fi
+fi
+exec "$dir"/{executable} "$@"
+exit 1
+"""
+
+# Compression policies for collected binaries
+COMPRESSION_POLICIES = ('min-size', 'min-startup', 'balanced')
+
+# Binaries UPX is known to break (Windows runtime DLLs protected by CFG, Qt plugins)
+UPX_NEVER_PATTERNS = ('vcruntime*.dll', 'msvcp*.dll', 'ucrtbase.dll', 'api-ms-win-*.dll', 'qwindows*.dll', '*qt*plugin*')
+
+# The balanced policy only UPX-compresses binaries below this size (1 MB), where decompression is cheap
+BALANCED_UPX_LIMIT = 1024 * 1024
+
+# Installed packages smaller than this are never suggested for exclusion (1 MB)
+DEFAULT_MIN_EXCLUDE_SIZE = 1024 * 1024
+
+# Layout of the cached parse results; entries written in another layout are parsed again
+IMPORT_PARSE_FORMAT = 2
+
+# Type codes of the files listed in PyInstaller's Analysis table of contents
+TOC_TYPECODES = ('PYMODULE', 'PYSOURCE', 'EXTENSION', 'BINARY', 'DATA')
+
+def default_cache_dir():
+    """
+    Return the default location of the build cache.
+    """
+    if platform.system() == 'Windows' and os.environ.get('LOCALAPPDATA'):
+        base = os.environ['LOCALAPPDATA']
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'kpypackager')
+
+def _input_paths(options, build_cwd):
+    """
+    Return the files and directories a build reads besides the project sources.
+
+    These are the sources of the data specifications and the paths given to options
+    such as --icon, --version-file or --additional-hooks-dir, relative to build_cwd.
+
+    Parameters:
+        options (dict): package_project options by name.
+        build_cwd (str): The directory PyInstaller runs in.
+    """
+    paths = [os.path.join(build_cwd, _data_source(options[option])) for option in DATA_SPEC_OPTIONS if options.get(option)]
+    paths += [os.path.join(build_cwd, options[option]) for option in INPUT_PATH_OPTIONS if options.get(option)]
+    return paths
+
+def _data_source(spec):
+    """
+    Return the source path of a PyInstaller 'source:destination' data specification.
+    """
+    for separator in (';', ':'):
+        source, found, _ = spec.rpartition(separator)
+        # A single character before ':' is a Windows drive letter, not a separator
+        if found and source and not (separator == ':' and len(source) == 1):
+            return source
+    return spec
+
+def _iter_tree_files(root, skip_paths=()):
+    """
+    Yield the files below root in a stable order, skipping VCS and tool caches and the given skip_paths.
+    """
+    if os.path.isfile(root):
+        yield root
+        return
+    skip_paths = {os.path.abspath(path) for path in skip_paths if path}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            d for d in dirnames
+            if d not in CACHE_SKIP_DIRS and os.path.abspath(os.path.join(dirpath, d)) not in skip_paths
+        )
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            if not filename.endswith(CACHE_SKIP_SUFFIXES) and os.path.abspath(path) not in skip_paths:
+                yield path
+
+def _iter_all_files(root):
+    """
+    Yield every file below root (or root itself when it is a file), without any filtering.
+    """
+    if not os.path.isdir(root):
+        yield root
+        return
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            yield os.path.join(dirpath, filename)
+
+def _hash_file(digest, path):
+    """
+    Feed the contents of a file into a hashlib digest.
+    """
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+
+def environment_fingerprint():
+    """
+    Return a digest of the interpreter version, platform and installed package versions.
+    """
+    installed = sorted(
+        f"{dist.metadata['Name']}=={dist.version}" for dist in importlib.metadata.distributions()
+        if dist.metadata['Name']
+    )
+    digest = hashlib.sha256()
+    digest.update(sys.version.encode())
+    digest.update(platform.platform().encode())
+    digest.update("\n".join(installed).encode())
+    return digest.hexdigest()
+
+def compute_cache_key(source_root, pyinstaller_command, data_paths=None, skip_paths=(), post_build=None):
+    """
+    Compute the content-addressed cache key of a build.
+
+    Parameters:
+        source_root (str): Directory (or script file) whose contents make up the project sources.
+        pyinstaller_command (list): The fully resolved PyInstaller command.
+        data_paths (list, optional): Additional files or directories bundled with the build.
+        skip_paths (list, optional): Paths to ignore while hashing, such as the output directory.
+        post_build (dict, optional): Settings applied to the artifact after PyInstaller ran.
+
+    Returns:
+        str: Hex digest identifying the build inputs.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(pyinstaller_command).encode())
+    if post_build:
+        digest.update(json.dumps(post_build, sort_keys=True).encode())
+    digest.update(environment_fingerprint().encode())
+    for root in [source_root] + list(data_paths or []):
+        if not os.path.exists(root):
+            continue
+        for path in _iter_tree_files(root, skip_paths):
+            digest.update(os.path.relpath(path, root).replace(os.sep, '/').encode())
+            _hash_file(digest, path)
+    return digest.hexdigest()
+
+def _artifact_name(pyinstaller_command, selected_path):
+    """
+    Return the name PyInstaller will give the produced executable.
+    """
+    name = None
+    for index, arg in enumerate(pyinstaller_command[:-1]):
+        if arg == "--name":
+            name = pyinstaller_command[index + 1]
+    return name or os.path.splitext(os.path.basename(os.path.normpath(selected_path)))[0]
+
+def _find_artifacts(dist_dir, artifact_name):
+    """
+    Return the paths in dist_dir that belong to the given artifact (executable, directory or bundle).
+    """
+    if not os.path.isdir(dist_dir):
+        return []
+    return [
+        os.path.join(dist_dir, entry) for entry in sorted(os.listdir(dist_dir))
+        if entry == artifact_name or os.path.splitext(entry)[0] == artifact_name
+    ]
+
+def _path_size(path):
+    """
+    Return the size in bytes of a file or of all files below a directory.
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(p) for p in _iter_all_files(path) if not os.path.islink(p))
+
+def _install_artifact(source, destination):
+    """
+    Copy a file or directory artifact to destination, replacing what is there.
+
+    Artifacts are copied rather than hard-linked so that a later build writing
+    into the output directory can never modify a cached entry in place.
+    """
+    if os.path.isdir(destination) and not os.path.islink(destination):
+        shutil.rmtree(destination)
+    elif os.path.lexists(destination):
+        os.remove(destination)
+    if os.path.isdir(source):
+        shutil.copytree(source, destination, symlinks=True)
+    else:
+        shutil.copy2(source, destination)
+
+def _read_json(path, default=None):
+    """
+    Load a JSON file, returning default when it is missing or unreadable.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def _temp_path(path, suffix='.tmp'):
+    """
+    Return a sibling of path to write before renaming it into place, unique to this process and thread.
+    """
+    return f"{path}.{os.getpid()}.{threading.get_ident()}{suffix}"
+
+def _write_json(path, data):
+    """
+    Atomically write data as JSON to path.
+    """
+    temp_path = _temp_path(path)
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, path)
+
+def _record_cache_event(cache_dir, event, count=1):
+    """
+    Increment one of the hit/miss/store/eviction counters of the build cache.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    stats_path = os.path.join(cache_dir, 'stats.json')
+    # Builds in other threads and in batch worker processes update the same counters
+    with _STATS_LOCK, open(f"{stats_path}.lock", 'a') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        stats = _read_json(stats_path, {})
+        stats[event] = stats.get(event, 0) + count
+        _write_json(stats_path, stats)
+
+def restore_from_cache(cache_dir, cache_key, dist_dir):
+    """
+    Restore a previously cached build into dist_dir.
+
+    Parameters:
+        cache_dir (str): Location of the build cache.
+        cache_key (str): Key returned by compute_cache_key.
+        dist_dir (str): Directory where the artifacts should be placed.
+
+    Returns:
+        list: Restored artifact paths, or None on a cache miss.
+    """
+    entry_dir = os.path.join(cache_dir, 'entries', cache_key)
+    entry = _read_json(os.path.join(entry_dir, 'entry.json'))
+    if not entry:
+        _record_cache_event(cache_dir, 'misses')
+        return None
+    os.makedirs(dist_dir, exist_ok=True)
+    restored = []
+    for artifact in entry['artifacts']:
+        destination = os.path.join(dist_dir, artifact)
+        _install_artifact(os.path.join(entry_dir, 'artifacts', artifact), destination)
+        restored.append(destination)
+    entry['last_used'] = time.time()
+    _write_json(os.path.join(entry_dir, 'entry.json'), entry)
+    _record_cache_event(cache_dir, 'hits')
+    return restored
+
+def store_in_cache(cache_dir, cache_key, artifact_paths, max_size=None):
+    """
+    Store the artifacts of a successful build in the cache and evict old entries.
+
+    Parameters:
+        cache_dir (str): Location of the build cache.
+        cache_key (str): Key returned by compute_cache_key.
+        artifact_paths (list): Files or directories produced by the build.
+        max_size (int, optional): Maximum size of the cache in bytes.
+    """
+    if not artifact_paths:
+        return
+    entries_dir = os.path.join(cache_dir, 'entries')
+    entry_dir = os.path.join(entries_dir, cache_key)
+    staging_dir = _temp_path(entry_dir)
+    os.makedirs(os.path.join(staging_dir, 'artifacts'), exist_ok=True)
+    for path in artifact_paths:
+        _install_artifact(path, os.path.join(staging_dir, 'artifacts', os.path.basename(path)))
+    now = time.time()
+    _write_json(os.path.join(staging_dir, 'entry.json'), {
+        'key': cache_key,
+        'artifacts': [os.path.basename(path) for path in artifact_paths],
+        'size': sum(_path_size(path) for path in artifact_paths),
+        'created': now,
+        'last_used': now,
+    })
+    try:
+        os.rename(staging_dir, entry_dir)
+    except OSError:
+        # Another build stored the same key first
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        return
+    _record_cache_event(cache_dir, 'stores')
+    evict_cache(cache_dir, max_size)
+
+def _cache_entries(cache_dir):
+    """
+    Return the metadata of all complete cache entries.
+    """
+    entries_dir = os.path.join(cache_dir, 'entries')
+    if not os.path.isdir(entries_dir):
+        return []
+    entries = []
+    for key in os.listdir(entries_dir):
+        if key.endswith('.tmp'):
+            # An entry still being stored
+            continue
+        entry = _read_json(os.path.join(entries_dir, key, 'entry.json'))
+        if entry:
+            entries.append(entry)
+    return entries
+
+def _cache_objects(cache_dir, store):
+    """
+    Return the path, size and last use of every object of one of the build cache's object stores.
+    """
+    objects = []
+    for path in _iter_all_files(os.path.join(cache_dir, store)):
+        if path.endswith(('.tmp', '.json')):
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        objects.append({'path': path, 'size': stat.st_size, 'last_used': stat.st_mtime})
+    return objects
+
+def _cache_work_dirs(cache_dir):
+    """
+    Return the path, size and last use of every incremental work directory kept in the build cache.
+    """
+    work_root = os.path.join(cache_dir, 'work')
+    if not os.path.isdir(work_root):
+        return []
+    work_dirs = []
+    for name in os.listdir(work_root):
+        path = os.path.join(work_root, name)
+        try:
+            last_used = os.stat(path).st_mtime
+        except OSError:
+            continue
+        work_dirs.append({'path': path, 'size': _path_size(path), 'last_used': last_used})
+    return work_dirs
+
+def evict_cache(cache_dir, max_size=None):
+    """
+    Remove least recently used cache entries, stored objects and incremental work directories
+    until the cache fits in max_size bytes.
+    """
+    max_size = DEFAULT_CACHE_MAX_SIZE if max_size is None else max_size
+    items = [
+        dict(entry, path=os.path.join(cache_dir, 'entries', entry['key'])) for entry in _cache_entries(cache_dir)
+    ]
+    for store in CACHE_OBJECT_STORES:
+        items.extend(_cache_objects(cache_dir, store))
+    items.extend(_cache_work_dirs(cache_dir))
+    items.sort(key=lambda item: item['last_used'])
+    total = sum(item['size'] for item in items)
+    evicted = 0
+    for item in items:
+        if total <= max_size:
+            break
+        if os.path.isdir(item['path']):
+            shutil.rmtree(item['path'], ignore_errors=True)
+        elif os.path.exists(item['path']):
+            os.remove(item['path'])
+            # The actions applied to a compressed binary are stored next to it
+            if os.path.exists(f"{item['path']}.json"):
+                os.remove(f"{item['path']}.json")
+        total -= item['size']
+        evicted += 1
+    if evicted:
+        _record_cache_event(cache_dir, 'evictions', evicted)
+
+def print_cache_stats(cache_dir=None):
+    """
+    Print the number of entries, total size and hit rate of the build cache.
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    entries = _cache_entries(cache_dir)
+    stats = _read_json(os.path.join(cache_dir, 'stats.json'), {})
+    hits, misses = stats.get('hits', 0), stats.get('misses', 0)
+    lookups = hits + misses
+    print(f"Build cache: {cache_dir}")
+    print(f"  Entries:   {len(entries)}")
+    print(f"  Size:      {sum(entry['size'] for entry in entries) / (1024 * 1024):.1f} MB")
+    for store, label in CACHE_OBJECT_STORES.items():
+        objects = _cache_objects(cache_dir, store)
+        print(f"  {label + ':':<10} {len(objects)} files, {sum(item['size'] for item in objects) / (1024 * 1024):.1f} MB")
+    work_dirs = _cache_work_dirs(cache_dir)
+    print(f"  Work dirs: {len(work_dirs)} projects, {sum(item['size'] for item in work_dirs) / (1024 * 1024):.1f} MB")
+    print(f"  Hits:      {hits}")
+    print(f"  Misses:    {misses}")
+    print(f"  Hit rate:  {(hits / lookups * 100) if lookups else 0:.1f}%")
+    print(f"  Evictions: {stats.get('evictions', 0)}")
+
+def incremental_work_dir(selected_path, name=None, cache_dir=None):
+    """
+    Return the stable PyInstaller work directory used by incremental builds of a project.
+    """
+    project_id = hashlib.sha256(f"{os.path.abspath(selected_path)}\0{name or ''}".encode()).hexdigest()[:16]
+    return os.path.join(cache_dir or default_cache_dir(), 'work', project_id)
+
+def _snapshot_files(roots, skip_paths=(), previous=None):
+    """
+    Record size, modification time and content hash of every file below roots.
+
+    Files whose size and modification time match the previous snapshot reuse its
+    hash, so an unchanged tree is snapshotted without reading file contents.
+    """
+    previous = previous or {}
+    snapshot = {}
+    for root in roots:
+        if not os.path.exists(root):
+            continue
+        for path in _iter_tree_files(root, skip_paths):
+            stat = os.stat(path)
+            old = previous.get(path)
+            if old and old[0] == stat.st_size and old[1] == stat.st_mtime_ns:
+                snapshot[path] = old
+            else:
+                digest = hashlib.sha256()
+                _hash_file(digest, path)
+                snapshot[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+    return snapshot
+
+def plan_incremental_build(work_dir, pyinstaller_command, source_paths, data_paths, skip_paths=()):
+    """
+    Decide whether an incremental build can reuse the PyInstaller work directory.
+
+    The work directory (holding the Analysis, PYZ and bytecode caches) is reused
+    unless the PyInstaller options, the interpreter or the installed packages
+    changed, or a source or data file was removed since the last build. The work
+    directory's modification time records its last use for cache eviction.
+
+    Parameters:
+        work_dir (str): The stable PyInstaller work directory.
+        pyinstaller_command (list): The resolved PyInstaller command, without clean flags.
+        source_paths (list): Project source files or directories.
+        data_paths (list): Data files and binaries bundled with the build.
+        skip_paths (list, optional): Paths to ignore while scanning, such as the output directory.
+
+    Returns:
+        dict: The plan, with 'reuse' (bool), 'reason' (str), 'changed' (list of paths) and 'state' (new state to save).
+    """
+    previous = _read_json(os.path.join(work_dir, 'kpypackager-state.json'), {})
+    command_hash = hashlib.sha256(json.dumps(pyinstaller_command).encode()).hexdigest()
+    environment = environment_fingerprint()
+    old_files = previous.get('sources', {})
+    old_files.update(previous.get('data', {}))
+    sources = _snapshot_files(source_paths, skip_paths, old_files)
+    data = _snapshot_files(data_paths, skip_paths, old_files)
+    current_files = dict(sources, **data)
+    changed = sorted(
+        path for path in set(current_files) | set(old_files)
+        if current_files.get(path, [None])[-1] != old_files.get(path, [None])[-1]
+    )
+    removed = [path for path in changed if path not in current_files]
+    if os.path.isdir(work_dir):
+        # A build in progress makes its work directory the last one to be evicted
+        os.utime(work_dir)
+
+    if not previous or not os.path.isdir(work_dir):
+        reason = "no previous build"
+    elif previous.get('command') != command_hash:
+        reason = "PyInstaller options changed"
+    elif previous.get('environment') != environment:
+        reason = "Python interpreter or installed packages changed"
+    elif removed:
+        reason = f"{len(removed)} file(s) removed"
+    else:
+        reason = None
+    state = dict(previous, command=command_hash, environment=environment, sources=sources, data=data)
+    return {'reuse': reason is None, 'reason': reason, 'changed': changed, 'state': state}
+
+def finish_incremental_build(work_dir, plan, seconds):
+    """
+    Save the incremental build state and report the time saved by reusing the work directory.
+    """
+    state = plan['state']
+    state['last_seconds'] = seconds
+    if plan['reuse']:
+        full_seconds = state.get('full_seconds')
+        saved = f", saved {full_seconds - seconds:.1f}s against a full build" if full_seconds and full_seconds > seconds else ""
+        print(f"Incremental build: reused work directory, {len(plan['changed'])} changed file(s), "
+              f"took {seconds:.1f}s{saved}")
+    else:
+        state['full_seconds'] = seconds
+        print(f"Incremental build: full rebuild ({plan['reason']}) took {seconds:.1f}s")
+    os.makedirs(work_dir, exist_ok=True)
+    _write_json(os.path.join(work_dir, 'kpypackager-state.json'), state)
+
+def _parse_imports(source, filename):
+    """
+    Collect the static and dynamic imports of a Python source file.
+
+    Returns:
+        dict: 'imports' as [module, level] pairs (names imported with 'from x import y' are
+        listed as 'x.y' as well, since y may be a submodule), 'dynamic' module names passed
+        as string literals to importlib.import_module or __import__, and 'prefixes' for
+        string concatenations and f-strings that start with a literal package name.
+        'guarded' lists the top-level modules imported only inside a try block catching
+        ImportError, which the file copes without.
+    """
+    result = {'imports': [], 'dynamic': [], 'prefixes': [], 'guarded': []}
+    try:
+        tree = ast.parse(source, filename)
+    except (SyntaxError, ValueError) as e:
+        result['error'] = str(e)
+        return result
+    guarded_nodes = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Try) and any(_catches_import_error(handler) for handler in node.handlers):
+            guarded_nodes.update(id(child) for statement in node.body for child in ast.walk(statement))
+    guarded = set()
+    binding = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            if isinstance(node, ast.Import):
+                imports = [[alias.name, 0] for alias in node.names]
+            else:
+                module = node.module or ''
+                imports = [[module, node.level]] if module else []
+                imports.extend(
+                    [f"{module}.{alias.name}" if module else alias.name, node.level]
+                    for alias in node.names if alias.name != '*'
+                )
+            result['imports'].extend(imports)
+            names = {module.split('.')[0] for module, level in imports if not level}
+            (guarded if id(node) in guarded_nodes else binding).update(names)
+        elif isinstance(node, ast.Call) and node.args:
+            func = node.func
+            func_name = func.attr if isinstance(func, ast.Attribute) else getattr(func, 'id', None)
+            if func_name not in ('import_module', '__import__'):
+                continue
+            arg = node.args[0]
+            if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                if not arg.value.startswith('.'):
+                    result['dynamic'].append(arg.value)
+            elif isinstance(arg, ast.BinOp) and isinstance(arg.left, ast.Constant) and isinstance(arg.left.value, str):
+                result['prefixes'].append(arg.left.value)
+            elif isinstance(arg, ast.JoinedStr) and arg.values and isinstance(arg.values[0], ast.Constant):
+                result['prefixes'].append(arg.values[0].value)
+    result['guarded'] = sorted(guarded - binding)
+    return result
+
+def _catches_import_error(handler):
+    """
+    Return whether an except clause catches ImportError (a bare except or Exception included).
+    """
+    names = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+    return any(
+        name is None or getattr(name, 'id', getattr(name, 'attr', None)) in ('ImportError', 'ModuleNotFoundError', 'Exception')
+        for name in names
+    )
+
+def _load_parse_results(path, cache, stats):
+    """
+    Return the parse results of a file, reusing the cache when its size and mtime (or content hash) match.
+    """
+    stat = os.stat(path)
+    entry = cache.get(path)
+    if entry and entry.get('format') != IMPORT_PARSE_FORMAT:
+        entry = None
+    if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+        stats['cached'] += 1
+        return entry['result']
+    with open(path, 'rb') as f:
+        source = f.read()
+    digest = hashlib.sha256(source).hexdigest()
+    if entry and entry['sha256'] == digest:
+        stats['cached'] += 1
+        result = entry['result']
+    else:
+        stats['parsed'] += 1
+        result = _parse_imports(source, path)
+    cache[path] = {
+        'format': IMPORT_PARSE_FORMAT, 'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': digest, 'result': result,
+    }
+    return result
+
+def _local_module_path(root, dotted_name):
+    """
+    Return the file implementing dotted_name inside root, or None if it is not a local module.
+    """
+    base = os.path.join(root, *dotted_name.split('.'))
+    for candidate in (base + '.py', os.path.join(base, '__init__.py')):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+def _module_name(root, path):
+    """
+    Return the dotted module name of a file below root.
+    """
+    parts = os.path.splitext(os.path.relpath(path, root))[0].split(os.sep)
+    if parts[-1] == '__init__':
+        parts = parts[:-1]
+    return '.'.join(parts)
+
+def _normalize_distribution_name(distribution_name):
+    """
+    Normalize a distribution name as described in PEP 503.
+    """
+    return re.sub(r'[-_.]+', '-', distribution_name).lower()
+
+def _installed_distributions():
+    """
+    Map every installed distribution to its top-level modules, Python sources, requirements and installed size.
+    """
+    distributions = {}
+    for dist in importlib.metadata.distributions():
+        if not dist.metadata['Name']:
+            continue
+        modules = set()
+        sources = []
+        size = 0
+        for file in dist.files or []:
+            size += file.size or 0
+            top = file.parts[0] if file.parts else ''
+            if top.endswith(('.dist-info', '.egg-info', '.data')) or top in ('..', '__pycache__'):
+                continue
+            if file.suffix == '.py':
+                sources.append(str(dist.locate_file(file)))
+            if len(file.parts) > 1 or top.endswith('.py'):
+                modules.add(top.split('.')[0])
+            elif top.endswith(('.so', '.pyd')):
+                modules.add(top.split('.')[0])
+        requires = []
+        for requirement in dist.requires or []:
+            if 'extra ==' in requirement:
+                continue
+            match = re.match(r'[A-Za-z0-9._-]+', requirement)
+            if match:
+                requires.append(_normalize_distribution_name(match.group(0)))
+        distributions[_normalize_distribution_name(dist.metadata['Name'])] = {
+            'name': dist.metadata['Name'], 'modules': modules, 'sources': sources, 'requires': requires, 'size': size,
+        }
+    return distributions
+
+def analyze_imports(selected_path, is_directory, cache_dir=None, min_exclude_size=DEFAULT_MIN_EXCLUDE_SIZE):
+    """
+    Statically analyze the import graph of a project to compute hidden imports and excludable packages.
+
+    Local modules are followed from the script (or every module of a directory project)
+    with ast. Imports made through string literals passed to importlib.import_module or
+    __import__ are invisible to PyInstaller and become hidden imports. PyInstaller also
+    collects every package a reachable dependency imports inside a try block catching
+    ImportError; installed packages imported only that way, and neither imported by the
+    project nor required by a reachable package, are reported as excludes when larger than
+    min_exclude_size. Parse results are cached per file, keyed on size and mtime with a
+    content hash fallback.
+
+    Parameters:
+        selected_path (str): Path to the Python project directory or script file.
+        is_directory (bool): Indicates whether the provided path is a directory.
+        cache_dir (str, optional): Location of the build cache holding the parse cache.
+        min_exclude_size (int, optional): Minimum installed size in bytes of a package suggested for exclusion.
+
+    Returns:
+        dict: 'hidden_imports', 'collect_submodules', 'excludes' (top-level modules),
+        'external' (imported top-level modules), 'reachable' (names of the installed
+        distributions the project can import) and parse statistics.
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    cache_path = os.path.join(cache_dir, 'import-analysis.json')
+    cache = _read_json(cache_path, {})
+    stats = {'parsed': 0, 'cached': 0}
+
+    root = os.path.abspath(selected_path if is_directory else os.path.dirname(selected_path) or '.')
+    if is_directory:
+        pending = [path for path in _iter_tree_files(root) if path.endswith('.py')]
+    else:
+        pending = [os.path.abspath(selected_path)]
+    visited = set()
+    external = set()
+    dynamic = set()
+    collect_submodules = set()
+    errors = []
+
+    while pending:
+        path = pending.pop()
+        if path in visited:
+            continue
+        visited.add(path)
+        result = _load_parse_results(path, cache, stats)
+        if 'error' in result:
+            errors.append(f"{path}: {result['error']}")
+        package = _module_name(root, path).split('.')
+        if not path.endswith('__init__.py'):
+            package = package[:-1]
+        for module, level in result['imports']:
+            if level:
+                base = package[:len(package) - (level - 1)] if level > 1 else package
+                module = '.'.join(base + ([module] if module else []))
+            local_path = _local_module_path(root, module) if module else None
+            if local_path:
+                pending.append(local_path)
+            elif not level:
+                external.add(module.split('.')[0])
+        for module in result['dynamic']:
+            dynamic.add(module)
+            local_path = _local_module_path(root, module)
+            if local_path:
+                pending.append(local_path)
+            else:
+                external.add(module.split('.')[0])
+        for prefix in result['prefixes']:
+            package_name = prefix.rstrip('.')
+            package_dir = os.path.join(root, *package_name.split('.'))
+            if package_name and os.path.isdir(package_dir):
+                for module_path in _iter_tree_files(package_dir):
+                    if module_path.endswith('.py'):
+                        dynamic.add(_module_name(root, module_path))
+                        pending.append(module_path)
+            elif package_name:
+                collect_submodules.add(package_name)
+                external.add(package_name.split('.')[0])
+
+    external = {module for module in external if module and not _is_stdlib_module(module)}
+
+    # Packages providing an imported module, plus everything they require or import, are
+    # reachable. Dependencies often import packages they never declare (pkg_resources, say),
+    # so the sources of every reachable package go through the same cached parse. Their
+    # guarded imports are optional: PyInstaller collects them, but nothing needs them.
+    distributions = _installed_distributions()
+    reachable = set()
+    optional = set()
+    imported = set(external)
+    pending = [key for key, dist in distributions.items() if dist['modules'] & imported]
+    while pending:
+        key = pending.pop()
+        if key in reachable or key not in distributions:
+            continue
+        reachable.add(key)
+        pending.extend(distributions[key]['requires'])
+        found = set()
+        for source in distributions[key]['sources']:
+            try:
+                result = _load_parse_results(source, cache, stats)
+            except OSError:
+                continue
+            guarded = set(result.get('guarded', ()))
+            found.update(module.split('.')[0] for module, level in result['imports'] if not level)
+            found.update(module.split('.')[0] for module in result['dynamic'])
+            found -= guarded
+            optional |= guarded
+        found = {module for module in found - imported if not _is_stdlib_module(module)}
+        imported |= found
+        pending.extend(other for other, dist in distributions.items() if dist['modules'] & found)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_json(cache_path, cache)
+
+    reachable_modules = set().union(*(distributions[key]['modules'] for key in reachable)) if reachable else set()
+    optional = {module for module in optional - reachable_modules - imported if not _is_stdlib_module(module)}
+
+    excludes = []
+    for key, dist in sorted(distributions.items()):
+        if key in reachable or dist['size'] < min_exclude_size:
+            continue
+        excludes.extend(sorted(module for module in dist['modules'] & optional if module.isidentifier()))
+
+    return {
+        'hidden_imports': sorted(dynamic),
+        'collect_submodules': sorted(collect_submodules),
+        'excludes': excludes,
+        'external': sorted(external),
+        'reachable': sorted(distributions[key]['name'] for key in reachable),
+        'files': len(visited),
+        'parsed': stats['parsed'],
+        'cached': stats['cached'],
+        'errors': errors,
+    }
+
+def collected_sizes(toc_path):
+    """
+    Return the bytes PyInstaller collected per top-level module, read from an Analysis table of contents.
+
+    Parameters:
+        toc_path (str): The Analysis-00.toc file in the work directory of a previous build.
+
+    Returns:
+        dict or None: Top-level module names mapped to the size of their collected files,
+        or None when there is no readable table of contents.
+    """
+    try:
+        with open(toc_path, encoding='utf-8') as f:
+            data = ast.literal_eval(f.read())
+    except (OSError, SyntaxError, ValueError, MemoryError, RecursionError):
+        return None
+    entries = {}
+    pending = [data]
+    while pending:
+        item = pending.pop()
+        if not isinstance(item, (list, tuple)):
+            continue
+        if len(item) == 3 and all(isinstance(part, str) for part in item) and item[2] in TOC_TYPECODES:
+            entries[item[0]] = item[1]
+        else:
+            pending.extend(item)
+    sizes = {}
+    for name, source in entries.items():
+        if not os.path.isfile(source):
+            continue
+        # Modules are dotted names, extensions and data files are paths inside the bundle
+        top_level = re.split(r'[./\\]', name)[0]
+        sizes[top_level] = sizes.get(top_level, 0) + os.path.getsize(source)
+    return sizes
+
+def print_import_analysis(analysis):
+    """
+    Print the result of analyze_imports.
+    """
+    print(f"Import analysis: {analysis['files']} modules ({analysis['parsed']} parsed, {analysis['cached']} from cache)")
+    for error in analysis['errors']:
+        print(f"  Could not parse {error}")
+    if analysis['hidden_imports']:
+        print(f"  Hidden imports: {', '.join(analysis['hidden_imports'])}")
+    if analysis['collect_submodules']:
+        print(f"  Collected submodules: {', '.join(analysis['collect_submodules'])}")
+    if analysis['excludes']:
+        print(f"  Excluded optional packages: {', '.join(analysis['excludes'])}")
+    if analysis.get('savings') is None:
+        print("  Projected size savings: unknown until PyInstaller has built the project once")
+    else:
+        print(f"  Projected size savings: {analysis['savings'] / (1024 * 1024):.1f} MB of what the last build collected")
+
+def _process_tree_rss(pid):
+    """
+    Return the combined resident memory in bytes of a process and its descendants, or None without /proc.
+    """
+    if not os.path.isdir('/proc'):
+        return None
+    total = 0
+    pending = [pid]
+    seen = set()
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+def _sample_memory(process, phases, stop_event, interval=0.1):
+    """
+    Record the peak memory of the PyInstaller process tree against the phase currently running.
+    """
+    while not stop_event.wait(interval):
+        rss = _process_tree_rss(process.pid)
+        if rss is None:
+            return
+        phase = phases[-1]
+        phase['peak_rss'] = max(phase['peak_rss'] or 0, rss)
+
+def _kill_process_group(process, terminate=False):
+    """
+    Kill a process started with start_new_session and everything it spawned (UPX, strip, ...).
+
+    With terminate, the group is asked to exit (SIGTERM) instead.
+    """
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signal.SIGTERM if terminate else signal.SIGKILL)
+        elif terminate:
+            process.terminate()
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def run_pyinstaller(pyinstaller_command, cwd=None, trace_path=None, env=None):
+    """
+    Run PyInstaller, streaming its log live while timing each build phase.
+
+    Phases (Analysis, PYZ, PKG, EXE, UPX, COLLECT, ...) are detected from PyInstaller's
+    log lines; each one runs until the next starts. Peak memory of the PyInstaller
+    process tree is sampled per phase where /proc is available.
+
+    Parameters:
+        pyinstaller_command (list): The PyInstaller command to execute.
+        cwd (str, optional): Working directory for PyInstaller.
+        trace_path (str, optional): Write the timing trace as JSON to this path, and as a
+            Chrome trace-event file next to it (with a .chrome.json suffix).
+        env (dict, optional): Environment for PyInstaller (defaults to the current one).
+
+    Returns:
+        tuple: PyInstaller's exit code and the timing trace dictionary.
+    """
+    started = time.time()
+    clock = time.perf_counter()
+    phases = _new_phases()
+    process = subprocess.Popen(
+        pyinstaller_command, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, errors='replace', bufsize=1, start_new_session=True
+    )
+    stop_event = threading.Event()
+    sampler = threading.Thread(target=_sample_memory, args=(process, phases, stop_event), daemon=True)
+    sampler.start()
+    try:
+        for line in process.stdout:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+            _track_phase(phases, line, time.perf_counter() - clock)
+        returncode = process.wait()
+    except BaseException:
+        _kill_process_group(process)
+        process.wait()
+        raise
+    finally:
+        stop_event.set()
+        sampler.join()
+    trace = _finish_trace(pyinstaller_command, started, phases, time.perf_counter() - clock, returncode, trace_path)
+    return returncode, trace
+
+def pyinstaller_version():
+    """
+    Return the version of the pyinstaller command as a (major, minor) tuple, or None if it cannot be determined.
+    """
+    try:
+        output = subprocess.run(["pyinstaller", "--version"], capture_output=True, text=True, timeout=60).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = re.search(r'(\d+)\.(\d+)', output)
+    return tuple(int(part) for part in match.groups()) if match else None
+
+def _new_phases():
+    """
+    Return the phase list of a build that has just started.
+    """
+    return [{'name': 'Setup', 'start': 0.0, 'end': None, 'peak_rss': None}]
+
+def _track_phase(phases, line, elapsed):
+    """
+    Start a new phase when a PyInstaller log line marks one.
+    """
+    match = PHASE_PATTERN.search(line)
+    phase_name = match.group(1) if match else 'UPX' if UPX_PATTERN.search(line) else None
+    if phase_name and phase_name != phases[-1]['name']:
+        phases[-1]['end'] = elapsed
+        phases.append({'name': phase_name, 'start': elapsed, 'end': None, 'peak_rss': None})
+
+def _finish_trace(pyinstaller_command, started, phases, total_seconds, returncode, trace_path=None):
+    """
+    Close the last phase and assemble (and optionally write) the timing trace of a build.
+    """
+    phases[-1]['end'] = total_seconds
+    for phase in phases:
+        phase['seconds'] = phase['end'] - phase['start']
+    trace = {
+        'command': pyinstaller_command,
+        'started': started,
+        'total_seconds': total_seconds,
+        'returncode': returncode,
+        'phases': phases,
+    }
+    if trace_path:
+        write_build_trace(trace, trace_path)
+    return trace
+
+def write_build_trace(trace, trace_path):
+    """
+    Write a build timing trace as JSON and as a Chrome trace-event file (viewable in chrome://tracing or Perfetto).
+    """
+    with open(trace_path, 'w') as f:
+        json.dump(trace, f, indent=2)
+    events = []
+    for phase in trace['phases']:
+        events.append({
+            'name': phase['name'], 'cat': 'pyinstaller', 'ph': 'X', 'pid': 1, 'tid': 1,
+            'ts': int((trace['started'] + phase['start']) * 1e6), 'dur': int(phase['seconds'] * 1e6),
+            'args': {'peak_rss': phase['peak_rss']},
+        })
+        if phase['peak_rss'] is not None:
+            events.append({
+                'name': 'memory', 'ph': 'C', 'pid': 1, 'ts': int((trace['started'] + phase['start']) * 1e6),
+                'args': {'peak_rss_mb': round(phase['peak_rss'] / (1024 * 1024), 1)},
+            })
+    chrome_path = os.path.splitext(trace_path)[0] + '.chrome.json'
+    with open(chrome_path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    print(f"Build trace written to {trace_path} and {chrome_path}")
+
+def print_build_phases(trace):
+    """
+    Print the time and peak memory spent in each build phase.
+    """
+    totals = {}
+    for phase in trace['phases']:
+        total = totals.setdefault(phase['name'], {'seconds': 0.0, 'peak_rss': None})
+        total['seconds'] += phase['seconds']
+        if phase['peak_rss'] is not None:
+            total['peak_rss'] = max(total['peak_rss'] or 0, phase['peak_rss'])
+    print(f"\n{'Phase':<10}  {'Time':>8}  {'Share':>6}  {'Peak RSS':>10}")
+    for phase_name, total in totals.items():
+        share = total['seconds'] / trace['total_seconds'] * 100 if trace['total_seconds'] else 0
+        rss = f"{total['peak_rss'] / (1024 * 1024):.1f} MB" if total['peak_rss'] else "-"
+        print(f"{phase_name:<10}  {total['seconds']:>7.2f}s  {share:>5.1f}%  {rss:>10}")
+    print(f"{'Total':<10}  {trace['total_seconds']:>7.2f}s")
+
+def classify_binary(path):
+    """
+    Classify a collected file by binary format and kind.
+
+    Returns:
+        dict: 'path', 'size', 'format' ('elf', 'pe', 'macho' or None for non-binaries) and
+        'kind' ('extension' for Python extension modules, 'library' or 'executable').
+    """
+    with open(path, 'rb') as f:
+        header = f.read(4)
+    if header == b'\x7fELF':
+        binary_format = 'elf'
+    elif header[:2] == b'MZ':
+        binary_format = 'pe'
+    elif header in (b'\xfe\xed\xfa\xce', b'\xfe\xed\xfa\xcf', b'\xce\xfa\xed\xfe', b'\xcf\xfa\xed\xfe', b'\xca\xfe\xba\xbe'):
+        binary_format = 'macho'
+    else:
+        binary_format = None
+    filename = os.path.basename(path).lower()
+    if filename.endswith('.pyd') or (binary_format and re.search(r'\.(cpython-|abi3|pypy)', filename)):
+        kind = 'extension'
+    elif re.search(r'\.(so(\.|$)|dll$|dylib$)', filename):
+        kind = 'library'
+    else:
+        kind = 'executable'
+    return {'path': path, 'size': os.path.getsize(path), 'format': binary_format, 'kind': kind}
+
+def plan_compression(binary, policy, upx_available=True, strip_available=True):
+    """
+    Choose the actions ('strip', 'upx') to apply to a classified binary under a compression policy.
+
+    Policies:
+        min-size: strip and UPX-compress every binary UPX is known to handle.
+        min-startup: strip only. UPX-compressed libraries must be decompressed into private
+            memory on every load, which costs time and prevents page sharing between processes.
+        balanced: strip everything and UPX-compress only binaries smaller than BALANCED_UPX_LIMIT.
+    """
+    if not binary['format']:
+        return []
+    actions = []
+    # Stripping or UPX-compressing Mach-O files would invalidate their code signatures
+    if binary['format'] == 'macho':
+        return []
+    if strip_available and binary['format'] == 'elf':
+        actions.append('strip')
+    filename = os.path.basename(binary['path']).lower()
+    upx_allowed = upx_available and not any(fnmatch.fnmatch(filename, pattern) for pattern in UPX_NEVER_PATTERNS)
+    if upx_allowed and (policy == 'min-size' or (policy == 'balanced' and binary['size'] < BALANCED_UPX_LIMIT)):
+        actions.append('upx')
+    return actions
+
+def _compress_binary(path, actions, tools, cache_dir):
+    """
+    Apply the planned actions to one binary, reusing a cached result for identical input.
+
+    UPX output is verified with 'upx -t' and discarded when the test fails. The actions
+    that actually applied are stored next to the cached object and reported on a hit.
+
+    Returns:
+        dict: The path, applied actions, sizes before and after, and whether the cache was used.
+    """
+    digest = hashlib.sha256()
+    _hash_file(digest, path)
+    digest.update(json.dumps([actions, tools]).encode())
+    key = digest.hexdigest()
+    cached_path = os.path.join(cache_dir, 'compressed', key[:2], key)
+    size_before = os.path.getsize(path)
+    temp_path = _temp_path(path)
+    applied = list(actions)
+    # Objects cached without their applied actions are rebuilt
+    cached = _read_json(f"{cached_path}.json") if os.path.exists(cached_path) else None
+    if cached:
+        applied = cached['actions']
+        shutil.copy2(cached_path, temp_path)
+        shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+        # The modification time records the last use for cache eviction
+        os.utime(cached_path)
+        return {'path': path, 'actions': applied, 'before': size_before, 'after': os.path.getsize(path), 'cached': True}
+
+    shutil.copy2(path, temp_path)
+    try:
+        if 'strip' in actions:
+            if subprocess.run([tools['strip'], '--strip-unneeded', temp_path], capture_output=True).returncode != 0:
+                applied.remove('strip')
+        if 'upx' in actions:
+            before_upx = f"{temp_path}.orig"
+            shutil.copy2(temp_path, before_upx)
+            upx_command = [tools['upx'], '-q'] + ([f"-{tools['upx_level']}"] if tools['upx_level'] else []) + [temp_path]
+            if subprocess.run(upx_command, capture_output=True).returncode != 0 or \
+                    subprocess.run([tools['upx'], '-q', '-t', temp_path], capture_output=True).returncode != 0:
+                os.replace(before_upx, temp_path)
+                applied.remove('upx')
+            else:
+                os.remove(before_upx)
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        _write_json(f"{cached_path}.json", {'actions': applied})
+        cached_temp_path = _temp_path(cached_path)
+        shutil.copyfile(temp_path, cached_temp_path)
+        os.replace(cached_temp_path, cached_path)
+        os.replace(temp_path, path)
+    finally:
+        for leftover in (temp_path, f"{temp_path}.orig"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    return {'path': path, 'actions': applied, 'before': size_before, 'after': os.path.getsize(path), 'cached': False}
+
+def _compression_tools(config):
+    """
+    Locate the strip and UPX tools for a build (UPX from upx_path/custom_upx when given).
+
+    UPX is left out when compression is disabled.
+    """
+    strip = shutil.which('strip') if platform.system() != 'Windows' else None
+    if not config.compress:
+        return {'upx': None, 'strip': strip, 'upx_level': None, 'upx_disabled': True}
+    upx = None
+    for candidate in (config.upx_path, config.custom_upx):
+        if candidate:
+            candidate = os.path.join(candidate, 'upx') if os.path.isdir(candidate) else candidate
+            upx = shutil.which(candidate)
+            if upx:
+                break
+    else:
+        upx = shutil.which('upx')
+    return {'upx': upx, 'strip': strip, 'upx_level': config.upx_level}
+
+def compress_artifact(artifact_dir, policy, tools, cache_dir, artifact_name=None, jobs=None):
+    """
+    Strip and UPX-compress the binaries of a onedir artifact according to a compression policy.
+
+    Every binary is classified and planned individually, the work runs in parallel
+    across cores, and results are cached by input hash so unchanged libraries are
+    never recompressed. The launcher executable is left alone, since it carries
+    PyInstaller's appended archive.
+
+    Parameters:
+        artifact_dir (str): The onedir artifact.
+        policy (str): One of COMPRESSION_POLICIES.
+        tools (dict): Tool paths as returned by _compression_tools.
+        cache_dir (str): Location of the build cache.
+        artifact_name (str, optional): Name of the launcher executable to skip.
+        jobs (int, optional): Number of parallel workers (defaults to the number of CPU cores).
+
+    Returns:
+        list: One result dictionary per processed binary.
+    """
+    launchers = {artifact_name, f"{artifact_name}.exe"} if artifact_name else set()
+    work = []
+    for path in _iter_all_files(artifact_dir):
+        if os.path.islink(path) or (os.path.dirname(path) == artifact_dir and os.path.basename(path) in launchers):
+            continue
+        actions = plan_compression(classify_binary(path), policy, bool(tools['upx']), bool(tools['strip']))
+        if actions:
+            work.append((path, actions))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        return list(pool.map(lambda item: _compress_binary(item[0], item[1], tools, cache_dir), work))
+
+def print_compression_report(policy, results, tools):
+    """
+    Print what the compression planner did to a build's binaries.
+    """
+    before = sum(result['before'] for result in results)
+    after = sum(result['after'] for result in results)
+    counts = {action: sum(action in result['actions'] for result in results) for action in ('strip', 'upx')}
+    missing = [tool for tool in ('strip', 'upx') if not tools[tool] and not (tool == 'upx' and tools.get('upx_disabled'))]
+    print(f"Compression ({policy}): {len(results)} binaries, {counts['strip']} stripped, {counts['upx']} UPX-compressed, "
+          f"{sum(result['cached'] for result in results)} from cache")
+    print(f"  {before / (1024 * 1024):.1f} MB -> {after / (1024 * 1024):.1f} MB")
+    if missing:
+        print(f"  Not found on this system: {', '.join(missing)}")
+
+def _apply_compression_policy(config, artifacts, artifact_name, cache_dir):
+    """
+    Run the compression planner on the onedir artifacts of a build when a policy is configured.
+    """
+    if not config.compression_policy:
+        return
+    tools = _compression_tools(config)
+    for artifact in artifacts:
+        if os.path.isdir(artifact):
+            results = compress_artifact(artifact, config.compression_policy, tools, cache_dir, artifact_name)
+            print_compression_report(config.compression_policy, results, tools)
+    evict_cache(cache_dir, config.cache_max_size)
+
+def _compile_module(job):
+    """
+    Compile one source file into the bytecode cache. Runs inside a worker process.
+
+    Returns:
+        str: The compile error, or None on success.
+    """
+    source_path, cache_path, optimize = job
+    temp_path = _temp_path(cache_path)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        py_compile.compile(
+            source_path, cfile=temp_path, dfile=source_path, doraise=True, optimize=optimize,
+            invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH
+        )
+        os.replace(temp_path, cache_path)
+    except (py_compile.PyCompileError, OSError, ValueError) as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return str(getattr(e, 'msg', e)).strip()
+    return None
+
+def _timestamp_pyc(pyc_data, source_stat):
+    """
+    Turn a cached checked-hash .pyc into the timestamp-based .pyc Python itself writes on import.
+
+    The code object is the same; only the header changes, so imports validate the file
+    against the source's modification time and size instead of hashing the source.
+    """
+    return (pyc_data[:4] + (0).to_bytes(4, 'little')
+            + (int(source_stat.st_mtime) & 0xFFFFFFFF).to_bytes(4, 'little')
+            + (source_stat.st_size & 0xFFFFFFFF).to_bytes(4, 'little') + pyc_data[16:])
+
+def _pyc_is_current(pyc_path, source, source_stat):
+    """
+    Return whether an existing .pyc file is valid for the given source.
+    """
+    try:
+        with open(pyc_path, 'rb') as f:
+            header = f.read(16)
+    except OSError:
+        return False
+    if len(header) < 16 or header[:4] != importlib.util.MAGIC_NUMBER:
+        return False
+    flags = int.from_bytes(header[4:8], 'little')
+    if flags & 1:
+        return header[8:16] == importlib.util.source_hash(source)
+    return (int.from_bytes(header[8:12], 'little') == int(source_stat.st_mtime) & 0xFFFFFFFF and
+            int.from_bytes(header[12:16], 'little') == source_stat.st_size & 0xFFFFFFFF)
+
+def precompile_bytecode(source_files, optimize=0, cache_dir=None, jobs=None):
+    """
+    Compile Python sources to bytecode in parallel, reusing a persistent cache shared by all builds.
+
+    This checks every source before PyInstaller spends time on the build, and warms the
+    bytecode the project runs from when started from source (PyInstaller itself compiles
+    the bundled modules from source into its work directory). Cache entries are
+    checked-hash .pyc files keyed by the source path, its content, the interpreter and the
+    optimization level, and count towards the build cache's size limit. Results are written
+    to the modules' standard __pycache__ slots (e.g. module.cpython-311.opt-2.pyc) as the
+    timestamp-based .pyc files Python would write there on first import. Slots already
+    holding a valid .pyc are left alone, and read-only locations are skipped. Level 2
+    also strips docstrings.
+
+    Parameters:
+        source_files (list): Python source files to compile.
+        optimize (int, optional): Optimization level (0, 1 or 2), as with python -O/-OO.
+        cache_dir (str, optional): Location of the build cache.
+        jobs (int, optional): Number of worker processes (defaults to the number of CPU cores).
+
+    Returns:
+        dict: Counts of modules 'compiled', 'reused' from the cache, already 'current', 'failed'
+        and 'skipped', the elapsed 'seconds' and the compile 'errors' by source path.
+    """
+    start = time.perf_counter()
+    pyc_dir = os.path.join(cache_dir or default_cache_dir(), 'pyc', sys.implementation.cache_tag, f"opt-{optimize}")
+    stats = {'compiled': 0, 'reused': 0, 'current': 0, 'failed': 0, 'skipped': 0, 'errors': {}}
+    modules = []
+    jobs_to_run = []
+    for source_path in dict.fromkeys(source_files):
+        try:
+            with open(source_path, 'rb') as f:
+                source = f.read()
+            source_stat = os.stat(source_path)
+        except OSError as e:
+            stats['failed'] += 1
+            stats['errors'][source_path] = e.strerror
+            continue
+        target = importlib.util.cache_from_source(source_path, optimization=optimize or '')
+        if _pyc_is_current(target, source, source_stat):
+            stats['current'] += 1
+            continue
+        key = hashlib.sha256(source_path.encode() + b'\0' + source).hexdigest()
+        cache_path = os.path.join(pyc_dir, key[:2], key)
+        modules.append((source_path, source_stat, cache_path, target))
+        if os.path.exists(cache_path):
+            # The modification time records the last use for cache eviction
+            os.utime(cache_path)
+            stats['reused'] += 1
+        else:
+            jobs_to_run.append((source_path, cache_path, optimize))
+
+    if jobs_to_run:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+            for (source_path, _, _), error in zip(jobs_to_run, pool.map(_compile_module, jobs_to_run, chunksize=32)):
+                if error is None:
+                    stats['compiled'] += 1
+                else:
+                    stats['failed'] += 1
+                    stats['errors'][source_path] = error
+
+    for source_path, source_stat, cache_path, target in modules:
+        try:
+            with open(cache_path, 'rb') as f:
+                pyc_data = f.read()
+        except OSError:
+            continue
+        temp_path = _temp_path(target)
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                f.write(_timestamp_pyc(pyc_data, source_stat))
+            os.replace(temp_path, target)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            stats['skipped'] += 1
+
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+def print_precompile_report(stats, optimize):
+    """
+    Print the result of precompile_bytecode.
+    """
+    total = stats['compiled'] + stats['reused'] + stats['current']
+    print(f"Precompiled {total} modules at -O{optimize} in {stats['seconds']:.1f}s: {stats['compiled']} compiled, "
+          f"{stats['reused']} reused from cache, {stats['current']} already up to date"
+          + (f", {stats['failed']} failed" if stats['failed'] else "")
+          + (f", {stats['skipped']} not writable" if stats['skipped'] else ""))
+    for source_path, error in stats['errors'].items():
+        print(f"  {source_path}: {error}")
+
+def _watch_ignored(path, skip_paths):
+    """
+    Return whether a change to path is irrelevant to the build.
+    """
+    filename = os.path.basename(path)
+    return (
+        filename in CACHE_SKIP_DIRS or filename.endswith(CACHE_SKIP_SUFFIXES)
+        or any(fnmatch.fnmatch(filename, pattern) for pattern in WATCH_IGNORED_PATTERNS)
+        or any(path == skip or path.startswith(skip + os.sep) for skip in skip_paths)
+    )
+
+class InotifyWatcher:
+    """
+    Recursive file watcher built on Linux inotify through ctypes.
+
+    Directories are watched recursively (new directories are added as they appear).
+    Watched files are observed through their parent directory, so editors that save
+    by replacing the file are still noticed.
+    """
+
+    def __init__(self, roots, skip_paths=()):
+        self.skip_paths = [os.path.abspath(path) for path in skip_paths if path]
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = {}
+        self.file_filters = {}
+        for root in roots:
+            root = os.path.abspath(root)
+            if os.path.isdir(root):
+                self._add_tree(root)
+            elif os.path.exists(root):
+                wd = self._add_watch(os.path.dirname(root))
+                if wd is not None:
+                    self.file_filters.setdefault(wd, set()).add(os.path.basename(root))
+
+    def _add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            return None
+        self.directories[wd] = directory
+        return wd
+
+    def _add_tree(self, root):
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not _watch_ignored(os.path.join(dirpath, d), self.skip_paths)]
+            wd = self._add_watch(dirpath)
+            # A whole-directory watch supersedes a file filter on the same directory
+            self.file_filters.pop(wd, None)
+
+    def read_changes(self):
+        """
+        Return the relevant paths changed since the last call (an empty list when nothing happened).
+        """
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        changes = []
+        offset = 0
+        while offset + 16 <= len(data):
+            wd, mask, _, length = struct.unpack_from('iIII', data, offset)
+            filename = data[offset + 16:offset + 16 + length].rstrip(b'\0').decode(errors='replace')
+            offset += 16 + length
+            if mask & IN_Q_OVERFLOW:
+                changes.append('*')
+                continue
+            directory = self.directories.get(wd)
+            if directory is None or not filename:
+                continue
+            if wd in self.file_filters and filename not in self.file_filters[wd]:
+                continue
+            path = os.path.join(directory, filename)
+            if _watch_ignored(path, self.skip_paths):
+                continue
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and wd not in self.file_filters:
+                self._add_tree(path)
+            changes.append(path)
+        return changes
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """
+    Portable file watcher comparing snapshots of size, mtime and content hash.
+    """
+
+    def __init__(self, roots, skip_paths=()):
+        self.roots = list(roots)
+        self.skip_paths = [os.path.abspath(path) for path in skip_paths if path]
+        self.snapshot = self._snapshot()
+
+    def _snapshot(self, previous=None):
+        snapshot = _snapshot_files(self.roots, self.skip_paths, previous)
+        return {path: state for path, state in snapshot.items() if not _watch_ignored(path, self.skip_paths)}
+
+    def read_changes(self):
+        """
+        Return the paths added, removed or modified since the last call.
+        """
+        snapshot = self._snapshot(self.snapshot)
+        changes = [
+            path for path in set(snapshot) | set(self.snapshot)
+            if snapshot.get(path, [None])[-1] != self.snapshot.get(path, [None])[-1]
+        ]
+        self.snapshot = snapshot
+        return changes
+
+    def close(self):
+        pass
+
+async def _wait_for_changes(watcher, changed, poll_interval):
+    """
+    Feed watcher changes into an asyncio.Event: through the event loop for inotify, by polling otherwise.
+    """
+    if isinstance(watcher, InotifyWatcher):
+        loop = asyncio.get_running_loop()
+        loop.add_reader(watcher.fd, lambda: watcher.read_changes() and changed.set())
+        try:
+            await asyncio.Event().wait()
+        finally:
+            loop.remove_reader(watcher.fd)
+    else:
+        while True:
+            await asyncio.sleep(poll_interval)
+            if await _to_thread(watcher.read_changes):
+                changed.set()
+
+async def _watch_build(config):
+    """
+    Run one build of watch mode and report its outcome.
+    """
+    try:
+        result = await package_project_async(config, on_output=lambda line: print(line, flush=True))
+    except asyncio.CancelledError:
+        print("Build cancelled: sources changed")
+        raise
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+        return
+    status = "restored from cache" if result.cache_hit else "succeeded" if result.ok else "failed"
+    print(f"Build {status} in {result.seconds:.1f}s. Watching for changes...")
+
+async def watch_project(config, debounce=0.5, poll=False, poll_interval=1.0):
+    """
+    Rebuild a project whenever its sources or bundled data files change.
+
+    Changes are detected with inotify on Linux and by polling elsewhere (or when
+    poll is set). A build in flight is cancelled as soon as a change arrives, and a
+    new one starts once no further change has been seen for debounce seconds.
+    Builds run incrementally and with the build cache enabled, so rebuilds reuse
+    the previous build's work directory.
+
+    Parameters:
+        config (BuildConfig): The build configuration.
+        debounce (float, optional): Quiet period in seconds that ends a burst of changes.
+        poll (bool, optional): Use polling even where inotify is available.
+        poll_interval (float, optional): Seconds between two polls.
+    """
+    config = dataclasses.replace(config, incremental=True, use_cache=True, no_confirm=True)
+    build_cwd = _build_cwd(config)
+    roots = [_source_root(config)] + _input_paths(dataclasses.asdict(config), build_cwd)
+    skip_paths = [
+        os.path.join(build_cwd, config.output_dir or 'dist'), os.path.join(build_cwd, 'build'),
+        _work_dir(config) and os.path.join(build_cwd, _work_dir(config)), config.cache_dir or default_cache_dir(),
+        config.trace_path,
+    ]
+    watcher = None
+    if not poll and platform.system() == 'Linux':
+        try:
+            watcher = InotifyWatcher(roots, skip_paths)
+        except OSError as e:
+            print(f"inotify unavailable ({e}), falling back to polling")
+    watcher = watcher or PollingWatcher(roots, skip_paths)
+    print(f"Watching {', '.join(roots)} ({'inotify' if isinstance(watcher, InotifyWatcher) else 'polling'})")
+
+    changed = asyncio.Event()
+    watch_task = asyncio.ensure_future(_wait_for_changes(watcher, changed, poll_interval))
+    build_task = asyncio.ensure_future(_watch_build(config))
+    try:
+        while True:
+            await changed.wait()
+            changed.clear()
+            if not build_task.done():
+                build_task.cancel()
+                await asyncio.gather(build_task, return_exceptions=True)
+            # Wait until the burst of changes is over
+            while True:
+                try:
+                    await asyncio.wait_for(changed.wait(), debounce)
+                    changed.clear()
+                except asyncio.TimeoutError:
+                    break
+            print("Changes detected, rebuilding...")
+            build_task = asyncio.ensure_future(_watch_build(config))
+    finally:
+        for task in (build_task, watch_task):
+            task.cancel()
+        await asyncio.gather(build_task, watch_task, return_exceptions=True)
+        watcher.close()
+
+def _store_object(store_dir, path):
+    """
+    Add a file to the content-addressed store unless its content is already there.
+
+    Returns:
+        tuple: The object path, and whether the content was already in the store.
+    """
+    digest = hashlib.sha256()
+    _hash_file(digest, path)
+    object_hash = digest.hexdigest()
+    object_path = os.path.join(store_dir, 'objects', object_hash[:2], object_hash)
+    if os.path.exists(object_path):
+        return object_path, True
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    try:
+        os.link(path, object_path)
+    except FileExistsError:
+        return object_path, True
+    except OSError:
+        # Different file system: copy the object in atomically instead
+        temp_path = _temp_path(object_path)
+        shutil.copy2(path, temp_path)
+        os.replace(temp_path, object_path)
+    return object_path, False
+
+def link_shared_runtime(artifact_dir, store_dir):
+    """
+    Replace every file of a onedir artifact with a link to a shared content-addressed store.
+
+    Identical files (the Python runtime, shared libraries, common packages) of all
+    artifacts linked against the same store then exist once on disk, and processes of
+    different tools share their pages in the OS page cache. Files are hard-linked when
+    the store is on the same file system and symlinked otherwise. Linked files must not
+    be modified in place, as that would change them for every artifact.
+
+    Parameters:
+        artifact_dir (str): The onedir artifact to link.
+        store_dir (str): The shared store directory.
+
+    Returns:
+        dict: Number of files and bytes linked, and bytes that were already in the store.
+    """
+    stats = {'files': 0, 'bytes': 0, 'shared_bytes': 0}
+    for path in _iter_all_files(artifact_dir):
+        if os.path.islink(path) or not os.path.isfile(path):
+            continue
+        size = os.path.getsize(path)
+        object_path, existed = _store_object(store_dir, path)
+        stats['files'] += 1
+        stats['bytes'] += size
+        if existed:
+            stats['shared_bytes'] += size
+        if os.path.samefile(path, object_path):
+            continue
+        temp_path = _temp_path(path, '.link')
+        try:
+            os.link(object_path, temp_path)
+        except OSError:
+            os.symlink(os.path.abspath(object_path), temp_path)
+        os.replace(temp_path, path)
+    return stats
+
+def shared_runtime_stats(store_dir):
+    """
+    Return the number of objects in a shared runtime store, their size on disk and the bytes saved by sharing.
+
+    Savings are derived from hard-link counts, so symlinked objects are not counted.
+    """
+    objects = stored = referenced = 0
+    for path in _iter_all_files(os.path.join(store_dir, 'objects')):
+        if not os.path.isfile(path):
+            continue
+        stat = os.stat(path)
+        objects += 1
+        stored += stat.st_size
+        # One link is the store's own entry
+        referenced += stat.st_size * max(stat.st_nlink - 1, 1)
+    return {'objects': objects, 'stored_bytes': stored, 'deduplicated_bytes': referenced - stored}
+
+def print_shared_runtime_stats(store_dir, link_stats=None):
+    """
+    Print how many bytes a shared runtime store deduplicates.
+    """
+    if link_stats:
+        print(f"Shared runtime: linked {link_stats['files']} files ({link_stats['bytes'] / (1024 * 1024):.1f} MB), "
+              f"{link_stats['shared_bytes'] / (1024 * 1024):.1f} MB already in {store_dir}")
+    stats = shared_runtime_stats(store_dir)
+    print(f"Shared runtime store: {stats['objects']} objects, {stats['stored_bytes'] / (1024 * 1024):.1f} MB on disk, "
+          f"{stats['deduplicated_bytes'] / (1024 * 1024):.1f} MB deduplicated")
+
+def _apply_shared_runtime(config, artifacts):
+    """
+    Link the onedir artifacts of a build into the shared runtime store when one is configured.
+    """
+    if not config.shared_runtime:
+        return
+    for artifact in artifacts:
+        if os.path.isdir(artifact):
+            print_shared_runtime_stats(config.shared_runtime, link_shared_runtime(artifact, config.shared_runtime))
+
+def lazy_runtime_dir(executable=None):
+    """
+    Return the per-user directory lazy onefile executables unpack into, or the entry of one executable.
+
+    Mirrors the lookup in LAZY_LAUNCHER for the current user.
+    """
+    root = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache')), 'kpypackager', 'lazy')
+    if executable is None:
+        return root
+    with open(executable, 'rb') as f:
+        match = re.search(rb'^# kpypackager lazy onefile: (\S+)$', f.read(256), re.MULTILINE)
+    return os.path.join(root, shlex.split(match.group(1).decode())[0]) if match else None
+
+def build_lazy_onefile(artifact_dir, output_path, mtime=None):
+    """
+    Pack a onedir artifact into a single executable that unpacks itself only once.
+
+    Standard onefile executables extract the whole archive into a fresh temporary
+    directory on every launch. A lazy onefile executable is a small shell launcher
+    followed by the onedir tree: the first launch unpacks it into a per-user cache
+    directory named after the tree's content hash, and every later launch executes
+    straight from there. Pure-Python modules stay inside PyInstaller's PYZ archive and
+    are imported from it; the tree only holds the bootloader, native extensions,
+    shared libraries and data files.
+
+    Parameters:
+        artifact_dir (str): The onedir artifact to pack.
+        output_path (str): Path of the executable to write.
+        mtime (int, optional): Timestamp stored for every packed file, making the executable reproducible.
+
+    Returns:
+        dict: 'entry' (the cache directory name), 'files', 'native_files', 'bytes' (unpacked) and 'size' (packed).
+    """
+    artifact_name = os.path.basename(os.path.normpath(artifact_dir))
+    executable_name = artifact_name
+    stats = {'files': 0, 'native_files': 0, 'bytes': 0}
+    digest = hashlib.sha256()
+    # Sorted, so the entry name does not depend on the file system's directory order
+    for path in sorted(_iter_all_files(artifact_dir)):
+        relative_path = os.path.relpath(path, artifact_dir).replace(os.sep, '/')
+        digest.update(relative_path.encode())
+        if os.path.islink(path):
+            digest.update(os.readlink(path).encode())
+            continue
+        _hash_file(digest, path)
+        stats['files'] += 1
+        stats['bytes'] += os.path.getsize(path)
+        if classify_binary(path)['format']:
+            stats['native_files'] += 1
+    stats['entry'] = f"{artifact_name}-{digest.hexdigest()[:16]}"
+
+    def normalize(info):
+        info.mtime = mtime
+        info.uid = info.gid = 0
+        info.uname = info.gname = ''
+        return info
+
+    payload_path = _temp_path(output_path, '.tar.gz')
+    try:
+        with open(payload_path, 'wb') as raw, gzip.GzipFile('', 'wb', fileobj=raw, mtime=mtime) as compressed, \
+                tarfile.open(fileobj=compressed, mode='w') as archive:
+            for entry in sorted(os.listdir(artifact_dir)):
+                archive.add(os.path.join(artifact_dir, entry), entry, filter=normalize if mtime is not None else None)
+        # tail -c counts from 1, and the offset is part of the launcher it points past
+        offset = 1
+        while True:
+            launcher = LAZY_LAUNCHER.format(
+                entry=shlex.quote(stats['entry']), executable=shlex.quote(executable_name), offset=offset
+            ).encode()
+            if offset == len(launcher) + 1:
+                break
+            offset = len(launcher) + 1
+        temp_path = _temp_path(output_path)
+        with open(temp_path, 'wb') as output, open(payload_path, 'rb') as payload:
+            output.write(launcher)
+            shutil.copyfileobj(payload, output)
+        os.chmod(temp_path, 0o755)
+    finally:
+        if os.path.exists(payload_path):
+            os.remove(payload_path)
+    if os.path.isdir(output_path):
+        shutil.rmtree(output_path)
+    os.replace(temp_path, output_path)
+    stats['size'] = os.path.getsize(output_path)
+    return stats
+
+def _apply_lazy_layout(config, artifacts, artifact_name, mtime=None):
+    """
+    Replace the onedir artifact of a lazy build with its lazy onefile executable.
+
+    Returns:
+        list: The artifacts of the build after packing.
+    """
+    if config.exe_format != 'lazy':
+        return artifacts
+    packed = []
+    for artifact in artifacts:
+        if os.path.isdir(artifact) and os.path.basename(artifact) == artifact_name:
+            stats = build_lazy_onefile(artifact, artifact, mtime)
+            print(f"Lazy onefile: packed {stats['files']} files ({stats['native_files']} native, "
+                  f"{stats['bytes'] / (1024 * 1024):.1f} MB) into {stats['size'] / (1024 * 1024):.1f} MB; "
+                  f"unpacked once into {os.path.join(lazy_runtime_dir(), stats['entry'])}")
+        packed.append(artifact)
+    return packed
+
+def source_date_epoch(source_root):
+    """
+    Return the timestamp of a reproducible build.
+
+    SOURCE_DATE_EPOCH from the environment wins, then the time of the last git commit
+    of the sources, then the modification time of the newest source file.
+    """
+    if os.environ.get('SOURCE_DATE_EPOCH', '').isdigit():
+        return int(os.environ['SOURCE_DATE_EPOCH'])
+    try:
+        completed = subprocess.run(
+            ['git', 'log', '-1', '--format=%ct'], cwd=source_root, capture_output=True, text=True, timeout=30
+        )
+        if completed.returncode == 0 and completed.stdout.strip().isdigit():
+            return int(completed.stdout.strip())
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return max((int(os.path.getmtime(path)) for path in _iter_tree_files(source_root)), default=0)
+
+def _scrub_prefixes(build_paths):
+    """
+    Return the build directories whose paths may be scrubbed, longest first.
+
+    File system roots, the home directory and its parents are refused: rewriting them
+    would mangle unrelated text such as URLs.
+    """
+    home = os.path.abspath(os.path.expanduser('~'))
+    prefixes = set()
+    for path in build_paths:
+        if not path:
+            continue
+        path = os.path.abspath(path)
+        if os.path.dirname(path) == path or home == path or home.startswith(path.rstrip(os.sep) + os.sep):
+            continue
+        prefixes.add(path.encode())
+    return sorted(prefixes, key=len, reverse=True)
+
+def scrub_build_paths(artifact, build_paths):
+    """
+    Remove absolute build paths from the package metadata of an artifact.
+
+    Only the text files of *.dist-info and *.egg-info directories (RECORD, direct_url.json,
+    SOURCES.txt, ...) are rewritten: paths below a build directory become relative to it,
+    and the directory itself becomes '.'. Application data and binaries are never modified;
+    the files among them still containing a build path are reported instead.
+
+    Parameters:
+        artifact (str): The artifact file or directory.
+        build_paths (list): Absolute directories of the build (sources, work and output directories).
+
+    Returns:
+        dict: 'scrubbed' (metadata files rewritten) and 'leaks' (other files still containing a build path).
+    """
+    stats = {'scrubbed': [], 'leaks': []}
+    prefixes = _scrub_prefixes(build_paths)
+    if not prefixes:
+        return stats
+    pattern = re.compile(b'(?:' + b'|'.join(re.escape(prefix) for prefix in prefixes) + rb')(?:[/\\]|(?![\w.-]))')
+    for path in _iter_all_files(artifact):
+        if os.path.islink(path) or not os.path.isfile(path) or not os.path.getsize(path):
+            continue
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if not pattern.search(data):
+                continue
+            binary = b'\0' in data[:8192] or classify_binary(path)['format'] is not None
+        relative_path = os.path.relpath(path, artifact) if os.path.isdir(artifact) else os.path.basename(path)
+        metadata = any(part.endswith(('.dist-info', '.egg-info')) for part in relative_path.split(os.sep)[:-1])
+        if binary or not metadata:
+            stats['leaks'].append(relative_path)
+            continue
+        with open(path, 'rb') as f:
+            content = pattern.sub(lambda match: b'' if match.group().endswith((b'/', b'\\')) else b'.', f.read())
+        temp_path = _temp_path(path)
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+        shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+        stats['scrubbed'].append(relative_path)
+    return stats
+
+def _normalize_mtimes(artifact, mtime):
+    """
+    Set the modification time of an artifact and of everything below it.
+    """
+    follow_symlinks = os.utime not in os.supports_follow_symlinks
+    paths = [artifact]
+    for dirpath, dirnames, filenames in os.walk(artifact):
+        paths.extend(os.path.join(dirpath, name) for name in dirnames + filenames)
+    for path in paths:
+        if follow_symlinks and os.path.islink(path):
+            continue
+        os.utime(path, (mtime, mtime), follow_symlinks=follow_symlinks)
+
+def artifact_manifest(artifact, mtime=None):
+    """
+    Return the content manifest of an artifact file or directory.
+
+    Returns:
+        dict: 'artifact' (its name), 'source_date_epoch', 'sha256' (over all entries) and
+        'files', mapping relative paths to their 'sha256', 'size' and permission 'mode'
+        (or the 'link' target of a symlink).
+    """
+    files = {}
+    for path in _iter_all_files(artifact):
+        relative_path = os.path.relpath(path, artifact).replace(os.sep, '/') if os.path.isdir(artifact) else os.path.basename(path)
+        if os.path.islink(path):
+            files[relative_path] = {'link': os.readlink(path)}
+            continue
+        digest = hashlib.sha256()
+        _hash_file(digest, path)
+        stat = os.stat(path)
+        files[relative_path] = {'sha256': digest.hexdigest(), 'size': stat.st_size, 'mode': stat.st_mode & 0o777}
+    files = dict(sorted(files.items()))
+    return {
+        'artifact': os.path.basename(os.path.normpath(artifact)), 'source_date_epoch': mtime,
+        'sha256': hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest(), 'files': files,
+    }
+
+def _manifest_path(artifact):
+    """
+    Return where the content manifest of an artifact is written.
+    """
+    return f"{os.path.normpath(artifact)}.manifest.json"
+
+def write_artifact_manifests(artifacts, mtime):
+    """
+    Normalize the timestamps of reproducible artifacts and write a content manifest next to each.
+    """
+    for artifact in artifacts:
+        _normalize_mtimes(artifact, mtime)
+        manifest = artifact_manifest(artifact, mtime)
+        _write_json(_manifest_path(artifact), manifest)
+        print(f"Content manifest: {len(manifest['files'])} files, sha256 {manifest['sha256'][:16]} -> {_manifest_path(artifact)}")
+
+def _apply_reproducible(context, artifacts):
+    """
+    Scrub absolute build paths from the artifacts of a reproducible build.
+    """
+    for artifact in artifacts:
+        stats = scrub_build_paths(artifact, context['build_paths'])
+        if stats['scrubbed']:
+            print(f"Scrubbed build paths from {len(stats['scrubbed'])} files: {', '.join(stats['scrubbed'])}")
+        if stats['leaks']:
+            print(f"Warning: build paths remain in {len(stats['leaks'])} files: {', '.join(stats['leaks'])}")
+
+def load_artifact_manifest(path):
+    """
+    Load a content manifest from a .manifest.json file, or compute it for an artifact file or directory.
+    """
+    if not os.path.exists(path):
+        raise ValueError(f"{path} does not exist")
+    if os.path.isfile(path) and path.endswith('.json'):
+        manifest = _read_json(path)
+        if isinstance(manifest, dict) and 'files' in manifest:
+            return manifest
+    return artifact_manifest(path)
+
+def diff_manifests(old, new):
+    """
+    Compare two content manifests file by file.
+
+    Returns:
+        dict: 'added', 'removed' and 'changed' file lists ('changed' entries hold the
+        'file' and its 'old' and 'new' manifest records), the number of 'identical'
+        files, and 'ship_bytes', the size of the added and changed files.
+    """
+    diff = {'added': [], 'removed': [], 'changed': [], 'identical': 0}
+    for name in sorted(set(old['files']) | set(new['files'])):
+        before, after = old['files'].get(name), new['files'].get(name)
+        if before is None:
+            diff['added'].append(name)
+        elif after is None:
+            diff['removed'].append(name)
+        elif before != after:
+            diff['changed'].append({'file': name, 'old': before, 'new': after})
+        else:
+            diff['identical'] += 1
+    shipped = diff['added'] + [change['file'] for change in diff['changed']]
+    diff['ship_bytes'] = sum(new['files'][name].get('size', 0) for name in shipped)
+    return diff
+
+def print_artifact_diff(diff):
+    """
+    Print the result of diff_manifests.
+    """
+    for name in diff['removed']:
+        print(f"  removed  {name}")
+    for name in diff['added']:
+        print(f"  added    {name}")
+    for change in diff['changed']:
+        old_size, new_size = change['old'].get('size', 0), change['new'].get('size', 0)
+        print(f"  changed  {change['file']} ({new_size / 1024:.1f} KB, {new_size - old_size:+d} bytes)")
+    print(f"{len(diff['changed'])} changed, {len(diff['added'])} added, {len(diff['removed'])} removed, "
+          f"{diff['identical']} identical; {diff['ship_bytes'] / (1024 * 1024):.1f} MB to ship")
+
+@dataclasses.dataclass(**DATACLASS_OPTIONS)
+class BuildConfig:
+    """
+    Configuration of a single build.
+
+    The fields mirror the parameters of package_project; see its docstring for their
+    meaning. Configurations are validated on creation and can be loaded from TOML or
+    JSON files with BuildConfig.from_file.
+    """
+    selected_path: str
+    is_directory: bool
+    output_dir: Optional[str] = None
+    include: Optional[str] = None
+    pyinstaller_args: Optional[str] = None
+    output_name: Optional[str] = None
+    clean: bool = False
+    icon: Optional[str] = None
+    hidden_imports: Optional[str] = None
+    version: Optional[str] = None
+    binaries: Optional[str] = None
+    license: Optional[str] = None
+    env_vars: Optional[str] = None
+    python: Optional[str] = None
+    compress: bool = True
+    hooks: Optional[str] = None
+    bootloader: Optional[str] = None
+    manifest: Optional[str] = None
+    splash: Optional[str] = None
+    runtime_hooks: Optional[str] = None
+    exe_format: str = 'exe'
+    system_path: Optional[str] = None
+    upx_level: Optional[int] = None
+    eula: Optional[str] = None
+    spec_file: Optional[str] = None
+    runtime_hook_spec: Optional[str] = None
+    template: Optional[str] = None
+    compile_pyc: bool = False
+    icon_mac: Optional[str] = None
+    package_data: Optional[str] = None
+    build_mode: Optional[str] = None
+    custom_hooks: Optional[str] = None
+    custom_upx: Optional[str] = None
+    bundle_stdlib: bool = False
+    exclude: Optional[str] = None
+    bootloader_conf: Optional[str] = None
+    verbose: bool = False
+    external_modules: Optional[str] = None
+    bundled_icon: Optional[str] = None
+    temp_dir: Optional[str] = None
+    upx_conf: Optional[str] = None
+    resource_files: Optional[str] = None
+    app_name: Optional[str] = None
+    log_dir: Optional[str] = None
+    app_version: Optional[str] = None
+    additional_files: Optional[str] = None
+    user_hooks: Optional[str] = None
+    file_version: Optional[str] = None
+    custom_library: Optional[str] = None
+    upx_path: Optional[str] = None
+    no_confirm: bool = False
+    custom_commands: Optional[str] = None
+    freeze_imports: Optional[bool] = None
+    clean_build: Optional[bool] = None
+    warn_project_version: Optional[bool] = None
+    warn_no_version: Optional[bool] = None
+    name: Optional[str] = None
+    use_cache: bool = True
+    cache_dir: Optional[str] = None
+    cache_max_size: Optional[int] = None
+    incremental: bool = False
+    analyze: bool = False
+    trace_path: Optional[str] = None
+    shared_runtime: Optional[str] = None
+    compression_policy: Optional[str] = None
+    precompile: bool = False
+    optimize: int = 0
+    reproducible: bool = False
+
+    def __post_init__(self):
+        if not self.selected_path:
+            raise ValueError("selected_path is required")
+        # The wizard passes empty strings for skipped answers
+        if not self.exe_format:
+            self.exe_format = 'exe'
+        if self.exe_format not in ('exe', 'directory', 'lazy'):
+            raise ValueError(f"exe_format must be 'exe', 'directory' or 'lazy', not {self.exe_format!r}")
+        if self.exe_format == 'lazy' and platform.system() == 'Windows':
+            raise ValueError("exe_format 'lazy' needs a POSIX shell and is not supported on Windows")
+        if self.upx_level in ('', None):
+            self.upx_level = None
+        else:
+            self.upx_level = int(self.upx_level)
+            if not 0 <= self.upx_level <= 9:
+                raise ValueError(f"upx_level must be between 0 and 9, not {self.upx_level}")
+        if self.compression_policy and self.compression_policy not in COMPRESSION_POLICIES:
+            raise ValueError(f"compression_policy must be one of {', '.join(COMPRESSION_POLICIES)}")
+        if self.optimize not in (0, 1, 2):
+            raise ValueError(f"optimize must be 0, 1 or 2, not {self.optimize!r}")
+        if self.cache_max_size is not None and self.cache_max_size <= 0:
+            raise ValueError("cache_max_size must be a positive number of bytes")
+
+    @classmethod
+    def from_dict(cls, options, base_dir=None):
+        """
+        Create a configuration from a dictionary of field values.
+
+        'path' and 'directory' are accepted as aliases of selected_path and is_directory.
+        When base_dir is given, relative paths in every path-valued option (including the
+        sources of data specifications) are resolved against it.
+        """
+        options = dict(options)
+        if 'path' in options:
+            options['selected_path'] = options.pop('path')
+        if 'directory' in options:
+            options['is_directory'] = options.pop('directory')
+        unknown = set(options) - {field.name for field in dataclasses.fields(cls)}
+        if unknown:
+            raise ValueError(f"Unknown build options: {', '.join(sorted(unknown))}")
+        if base_dir:
+            if options.get('selected_path'):
+                options['selected_path'] = os.path.join(base_dir, options['selected_path'])
+            _resolve_option_paths(options, base_dir)
+        if 'is_directory' not in options and options.get('selected_path'):
+            options['is_directory'] = os.path.isdir(options['selected_path'])
+        return cls(**options)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load a configuration from a TOML or JSON file. Paths are relative to the file's directory.
+        """
+        return cls.from_dict(load_config_file(path), os.path.dirname(os.path.abspath(path)))
+
+@dataclasses.dataclass(**DATACLASS_OPTIONS)
+class BuildResult:
+    """
+    Outcome of a build started with run().
+
+    Attributes:
+        config (BuildConfig): The configuration that was built.
+        command (list): The PyInstaller command (as executed, or as it would have been on a cache hit).
+        returncode (int): PyInstaller's exit code (0 on a cache hit).
+        artifacts (list): Paths of the packaged artifacts.
+        sizes (dict): Size in bytes of every artifact.
+        seconds (float): Wall time of the whole build.
+        phases (list): Timed build phases as recorded by run_pyinstaller (empty on a cache hit).
+        cache_hit (bool): Whether the artifacts were restored from the build cache.
+    """
+    config: BuildConfig
+    command: List[str]
+    returncode: int
+    artifacts: List[str] = dataclasses.field(default_factory=list)
+    sizes: Dict[str, int] = dataclasses.field(default_factory=dict)
+    seconds: float = 0.0
+    phases: List[dict] = dataclasses.field(default_factory=list)
+    cache_hit: bool = False
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and bool(self.artifacts)
+
+    @property
+    def size(self):
+        return sum(self.sizes.values())
+
+def load_config_file(path):
+    """
+    Load a TOML or JSON configuration file into a dictionary.
+    """
+    if path.endswith('.json'):
+        with open(path) as f:
+            return json.load(f)
+    if tomllib is None:
+        raise RuntimeError("Reading TOML files requires Python 3.11+ or the 'tomli' package")
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
+
+def _source_root(config):
+    """
+    Return the directory holding the sources of a build.
+    """
+    return os.path.abspath(config.selected_path if config.is_directory else os.path.dirname(config.selected_path) or '.')
+
+def _build_cwd(config):
+    """
+    Return the directory PyInstaller runs in: the script's directory, or the current one for directory projects.
+    """
+    return os.getcwd() if config.is_directory else _source_root(config)
+
+def _work_dir(config):
+    """
+    Return the PyInstaller work directory of a build, or None for PyInstaller's default.
+    """
+    if config.temp_dir:
+        return config.temp_dir
+    if config.incremental:
+        return incremental_work_dir(config.selected_path, config.name or config.output_name, config.cache_dir)
+    return None
+
+def build_command(config, analysis=None):
+    """
+    Return the PyInstaller command for a build configuration.
+
+    This only assembles arguments and never touches the file system, so it is cheap to
+    call for planning. run() may drop --clean/--clean-build for incremental builds.
+
+    Parameters:
+        config (BuildConfig): The build configuration.
+        analysis (dict, optional): Result of analyze_imports to apply to the command.
+
+    Returns:
+        list: The PyInstaller command line.
+    """
+    system = platform.system()
+    pyinstaller_command = ["pyinstaller"]
+    if system == 'Windows':
+        if config.exe_format == 'exe':
+            pyinstaller_command.append("--onefile")
+        else:
+            pyinstaller_command.append("--onedir")
+    elif system == 'Darwin':  # macOS
+        pyinstaller_command.append("--onedir" if config.exe_format == 'lazy' else "--onefile")
+        pyinstaller_command.append("--osx-bundle-identifier=com.example.app")
+        pyinstaller_command.append("--osx-bundle-name=AppName")
+    elif system == 'Linux':
+        if config.exe_format == 'exe':
+            pyinstaller_command.append("--onefile")
+        else:
+            pyinstaller_command.append("--onedir")
+        pyinstaller_command.append("--linux-bundle-name=AppName")
+
+    work_dir = _work_dir(config)
+    # Append optional arguments to PyInstaller command
+    if config.output_dir:
+        pyinstaller_command.extend(["--distpath", config.output_dir])
+    if config.include:
+        pyinstaller_command.extend(["--add-data", config.include])
+    if config.pyinstaller_args:
+        pyinstaller_command.extend(config.pyinstaller_args.split())
+    if config.output_name:
+        pyinstaller_command.extend(["--name", config.output_name])
+    if config.clean:
+        pyinstaller_command.append("--clean")
+    if config.icon:
+        pyinstaller_command.extend(["--icon", config.icon])
+    if config.hidden_imports:
+        pyinstaller_command.extend(["--hidden-import", config.hidden_imports])
+    if config.version:
+        pyinstaller_command.extend(["--version-file", config.version])
+    if config.binaries:
+        pyinstaller_command.extend(["--add-binary", config.binaries])
+    if config.license:
+        pyinstaller_command.extend(["--license", config.license])
+    if config.env_vars:
+        for var in config.env_vars.split(','):
+            pyinstaller_command.extend(["--set-env", var])
+    if config.python:
+        pyinstaller_command.extend(["--python", config.python])
+    # With a compression policy, onedir binaries are compressed one by one after the build. Onefile
+    # archives are sealed by then, so the policy maps onto PyInstaller's global switches instead.
+    onefile = "--onefile" in pyinstaller_command
+    policy_upx = config.compression_policy == 'min-size' and onefile
+    if not config.compress or (config.compression_policy and not policy_upx):
+        pyinstaller_command.append("--noupx")
+    if config.compression_policy and onefile and system != 'Windows':
+        pyinstaller_command.append("--strip")
+    if config.hooks:
+        pyinstaller_command.extend(["--additional-hooks-dir", config.hooks])
+    if config.bootloader:
+        pyinstaller_command.extend(["--bootloader-path", config.bootloader])
+    if config.manifest:
+        pyinstaller_command.extend(["--manifest", config.manifest])
+    if config.splash:
+        pyinstaller_command.extend(["--splash", config.splash])
+    if config.runtime_hooks:
+        pyinstaller_command.extend(["--runtime-hook", config.runtime_hooks])
+    if config.system_path:
+        pyinstaller_command.extend(["--paths", config.system_path])
+    if config.upx_level:
+        pyinstaller_command.extend(["--upx", f"--upx-level={config.upx_level}"])
+    if config.eula:
+        pyinstaller_command.extend(["--eula", config.eula])
+    if config.spec_file:
+        pyinstaller_command.extend(["--specpath", config.spec_file])
+    if config.runtime_hook_spec:
+        pyinstaller_command.extend(["--runtime-hook-spec", config.runtime_hook_spec])
+    if config.template:
+        pyinstaller_command.extend(["--template", config.template])
+    if config.compile_pyc:
+        pyinstaller_command.append("--compile")
+    if config.optimize:
+        pyinstaller_command.extend(["--optimize", str(config.optimize)])
+    if config.icon_mac:
+        pyinstaller_command.extend(["--osx-bundle-icon", config.icon_mac])
+    if config.package_data:
+        pyinstaller_command.extend(["--package-data", config.package_data])
+    if config.build_mode:
+        pyinstaller_command.extend(["--mode", config.build_mode])
+    if config.custom_hooks:
+        pyinstaller_command.extend(["--hooks-path", config.custom_hooks])
+    if config.custom_upx:
+        pyinstaller_command.extend(["--upx-dir", config.custom_upx])
+    #if bundle_stdlib:
+        #pyinstaller_command.append("--no-strippython")
+    if config.exclude:
+        pyinstaller_command.extend(["--exclude", config.exclude])
+    if config.bootloader_conf:
+        pyinstaller_command.extend(["--bootloader-conf", config.bootloader_conf])
+    if config.verbose:
+        pyinstaller_command.append("--log-level=DEBUG")
+    if config.external_modules:
+        pyinstaller_command.extend(["--ext-module", config.external_modules])
+    if config.bundled_icon:
+        pyinstaller_command.extend(["--icon", config.bundled_icon])
+    if work_dir:
+        pyinstaller_command.extend(["--workpath", work_dir])
+    if config.upx_conf:
+        pyinstaller_command.extend(["--upx-conf", config.upx_conf])
+    if config.resource_files:
+        pyinstaller_command.extend(["--resource", config.resource_files])
+    if config.app_name:
+        pyinstaller_command.extend(["--appname", config.app_name])
+    if config.log_dir:
+        pyinstaller_command.extend(["--logfile", config.log_dir])
+    if config.app_version:
+        pyinstaller_command.extend(["--version", config.app_version])
+    if config.additional_files:
+        pyinstaller_command.extend(["--add-data", config.additional_files])
+    if config.user_hooks:
+        pyinstaller_command.extend(["--user-hooks", config.user_hooks])
+    if config.file_version:
+        pyinstaller_command.extend(["--file-version", config.file_version])
+    if config.custom_library:
+        pyinstaller_command.extend(["--custom-library", config.custom_library])
+    if config.upx_path:
+        pyinstaller_command.extend(["--upx-path", config.upx_path])
+
+    if config.custom_commands:
+        pyinstaller_command.extend(config.custom_commands.split())
+
+    if config.freeze_imports:
+        pyinstaller_command.append("--no-packing")
+
+    if config.clean_build:
+        pyinstaller_command.append("--clean-build")
+
+    if config.warn_project_version:
+        pyinstaller_command.append("--warn-project")
+
+    if config.warn_no_version:
+        pyinstaller_command.append("--warn-no-version")
+
+    if config.name:
+        pyinstaller_command.extend(["--name", config.name])
+
+    if analysis:
+        for module in analysis['hidden_imports']:
+            pyinstaller_command.extend(["--hidden-import", module])
+        for package in analysis['collect_submodules']:
+            pyinstaller_command.extend(["--collect-submodules", package])
+        for module in analysis['excludes']:
+            pyinstaller_command.extend(["--exclude-module", module])
+
+    if config.is_directory:
+        pyinstaller_command.append(config.selected_path)
+    else:
+        if not (config.name or config.output_name):
+            pyinstaller_command.extend(["--name", os.path.basename(config.selected_path).split(".")[0]])
+        pyinstaller_command.append(os.path.abspath(config.selected_path))
+
+    # PyInstaller's output is always captured, so it can never prompt; _prepare_build asks instead
+    pyinstaller_command.append("--noconfirm")
+    return pyinstaller_command
+
+def _confirm_overwrite(output_dir):
+    """
+    Ask whether an existing onedir output directory may be replaced by the build.
+
+    Without a terminal to ask on, the answer is no.
+
+    Returns:
+        bool: True when the build may go ahead.
+    """
+    if not (sys.stdin and sys.stdin.isatty()):
+        print(f"An error occurred: {output_dir} already exists; pass --no-confirm to replace it")
+        return False
+    answer = input(f"The output directory {output_dir} and ALL ITS CONTENTS will be REMOVED! Continue? (y/N) ")
+    if answer.strip().lower() != 'y':
+        print("Packaging aborted.")
+        return False
+    return True
+
+def _prepare_build(config):
+    """
+    Resolve everything a build needs before PyInstaller starts.
+
+    Runs the import analysis, the cache lookup and the incremental planning.
+
+    Returns:
+        tuple: A BuildResult when the build was restored from the cache (else None),
+        and the build context dictionary passed on to _finish_build.
+    """
+    start = time.perf_counter()
+    source_root = _source_root(config)
+    analysis = None
+    if config.analyze:
+        analysis = analyze_imports(config.selected_path, config.is_directory, config.cache_dir)
+    pyinstaller_command = build_command(config, analysis)
+    if config.optimize:
+        version = pyinstaller_version()
+        if version and version < PYINSTALLER_OPTIMIZE_VERSION:
+            print(f"Warning: PyInstaller {'.'.join(map(str, version))} has no --optimize option (6.6+ is needed); "
+                  "the bundled bytecode is not optimized")
+            index = pyinstaller_command.index("--optimize")
+            del pyinstaller_command[index:index + 2]
+
+    # PyInstaller runs from the script's directory without touching the process cwd
+    build_cwd = _build_cwd(config)
+    work_dir = _work_dir(config)
+    cache_dir = config.cache_dir or default_cache_dir()
+    dist_dir = os.path.join(build_cwd, config.output_dir or 'dist')
+    artifact_name = _artifact_name(pyinstaller_command, config.selected_path)
+    data_paths = _input_paths(dataclasses.asdict(config), build_cwd)
+    # Only this build's own outputs are skipped; a 'build' or 'dist' package in the sources is an input
+    skip_paths = [dist_dir, os.path.join(build_cwd, work_dir or 'build'), cache_dir, config.trace_path]
+    if analysis:
+        # Savings are measured on what the previous build actually collected for the excludes
+        sizes = collected_sizes(os.path.join(build_cwd, work_dir or 'build', artifact_name, 'Analysis-00.toc'))
+        analysis['savings'] = None if sizes is None else sum(sizes.get(module, 0) for module in analysis['excludes'])
+        print_import_analysis(analysis)
+    env = mtime = None
+    if config.reproducible:
+        # A fixed hash seed keeps PyInstaller's table of contents in a stable order
+        mtime = source_date_epoch(source_root)
+        env = dict(os.environ, SOURCE_DATE_EPOCH=str(mtime))
+        env.setdefault('PYTHONHASHSEED', '0')
+    cache_key = None
+    if config.use_cache:
+        # Lazy and onedir builds run the same PyInstaller command
+        post_build = {'exe_format': 'lazy'} if config.exe_format == 'lazy' else {}
+        if config.reproducible:
+            post_build['source_date_epoch'] = mtime
+        cache_key = compute_cache_key(source_root, pyinstaller_command, data_paths, skip_paths, post_build)
+        restored = restore_from_cache(cache_dir, cache_key, dist_dir)
+        if restored is not None:
+            print(f"Build cache hit ({cache_key[:12]}): restored {artifact_name} into {dist_dir}")
+            if config.reproducible:
+                write_artifact_manifests(restored, mtime)
+            _apply_shared_runtime(config, restored)
+            result = BuildResult(
+                config, pyinstaller_command, 0, restored, {path: _path_size(path) for path in restored},
+                time.perf_counter() - start, [], True
+            )
+            return result, None
+
+    output_dir = os.path.join(dist_dir, artifact_name)
+    if not config.no_confirm and "--onefile" not in pyinstaller_command and os.path.isdir(output_dir):
+        if not _confirm_overwrite(output_dir):
+            return BuildResult(config, pyinstaller_command, 1, seconds=time.perf_counter() - start), None
+
+    if config.precompile:
+        source_files = [path for path in _iter_tree_files(source_root, skip_paths) if path.endswith('.py')]
+        print_precompile_report(precompile_bytecode(source_files, config.optimize, cache_dir), config.optimize)
+        evict_cache(cache_dir, config.cache_max_size)
+
+    plan = None
+    if config.incremental:
+        # Clean flags would discard the work directory; only start from scratch when the plan requires it
+        work_dir = os.path.join(build_cwd, work_dir)
+        pyinstaller_command = [arg for arg in pyinstaller_command if arg not in ("--clean", "--clean-build")]
+        # The environment of a reproducible build shapes the work directory like an option does
+        plan_command = pyinstaller_command + [f"{key}={env[key]}" for key in ('SOURCE_DATE_EPOCH', 'PYTHONHASHSEED')] if env else pyinstaller_command
+        plan = plan_incremental_build(work_dir, plan_command, [source_root], data_paths, skip_paths)
+        if not plan['reuse']:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            pyinstaller_command.insert(1, "--clean")
+
+    lazy_executable = os.path.join(dist_dir, artifact_name)
+    if config.exe_format == 'lazy' and os.path.isfile(lazy_executable):
+        # PyInstaller collects the onedir tree where the previous lazy executable is
+        os.remove(lazy_executable)
+
+    return None, {
+        'config': config, 'command': pyinstaller_command, 'cwd': build_cwd, 'start': start,
+        'dist_dir': dist_dir, 'artifact_name': artifact_name, 'work_dir': work_dir,
+        'cache_dir': cache_dir, 'cache_key': cache_key, 'plan': plan, 'env': env, 'source_date_epoch': mtime,
+        # Never the current directory of a directory project, which may be anything up to /
+        'build_paths': [source_root, os.path.join(build_cwd, work_dir or 'build'), dist_dir],
+    }
+
+def _finish_build(context, returncode, trace):
+    """
+    Collect the artifacts of a finished PyInstaller run and update the incremental state and cache.
+    """
+    config = context['config']
+    print_build_phases(trace)
+    if returncode != 0:
+        print(f"PyInstaller failed with exit code {returncode}")
+        return BuildResult(
+            config, context['command'], returncode,
+            seconds=time.perf_counter() - context['start'], phases=trace['phases']
+        )
+    if context['plan']:
+        finish_incremental_build(context['work_dir'], context['plan'], trace['total_seconds'])
+    artifacts = _find_artifacts(context['dist_dir'], context['artifact_name'])
+    _apply_compression_policy(config, artifacts, context['artifact_name'], context['cache_dir'])
+    if config.reproducible:
+        _apply_reproducible(context, artifacts)
+    artifacts = _apply_lazy_layout(config, artifacts, context['artifact_name'], context['source_date_epoch'])
+    if config.reproducible:
+        write_artifact_manifests(artifacts, context['source_date_epoch'])
+    if context['cache_key']:
+        store_in_cache(context['cache_dir'], context['cache_key'], artifacts, config.cache_max_size)
+    _apply_shared_runtime(config, artifacts)
+    print("Project packaged successfully!")
+    return BuildResult(
+        config, context['command'], returncode, artifacts, {path: _path_size(path) for path in artifacts},
+        time.perf_counter() - context['start'], trace['phases']
+    )
+
+def run(config):
+    """
+    Package a project described by a BuildConfig.
+
+    Parameters:
+        config (BuildConfig): The build configuration.
+
+    Returns:
+        BuildResult: The exit code, artifacts, sizes and timings of the build.
+    """
+    result, context = _prepare_build(config)
+    if result:
+        return result
+    returncode, trace = run_pyinstaller(context['command'], context['cwd'], config.trace_path, context['env'])
+    return _finish_build(context, returncode, trace)
+
+def _to_thread(func, *args):
+    """
+    Run func in the event loop's default executor (asyncio.to_thread needs Python 3.9+).
+    """
+    return asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+async def _run_build_step(func, *args):
+    """
+    Run a build step in a worker thread that is waited for even when the awaiting task is cancelled.
+
+    Threads cannot be interrupted: returning early would leave the step writing to the
+    cache, work and dist directories while the next build of the same project starts.
+    """
+    future = _to_thread(func, *args)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        while not future.done():
+            try:
+                await asyncio.wait({future})
+            except asyncio.CancelledError:
+                pass
+        raise
+
+async def _terminate(process, grace_period=5.0):
+    """
+    Stop a PyInstaller child and the tools it spawned: terminate them, then kill them
+    if PyInstaller does not exit within grace_period seconds.
+    """
+    if process.returncode is not None:
+        return
+    _kill_process_group(process, terminate=True)
+    try:
+        await asyncio.wait_for(process.wait(), grace_period)
+    except asyncio.TimeoutError:
+        pass
+    # Also reaches a UPX or strip child that outlived PyInstaller
+    _kill_process_group(process)
+    await process.wait()
+
+async def _stream_pyinstaller(context, on_output=None):
+    """
+    Run PyInstaller as an asyncio subprocess, passing every log line to on_output as it arrives.
+
+    on_output may be a plain function or a coroutine function. The child is terminated
+    when the surrounding task is cancelled or times out.
+    """
+    started = time.time()
+    clock = time.perf_counter()
+    phases = _new_phases()
+    process = await asyncio.create_subprocess_exec(
+        *context['command'], cwd=context['cwd'], env=context['env'], stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+        limit=1024 * 1024, start_new_session=True
+    )
+    stop_event = threading.Event()
+    sampler = threading.Thread(target=_sample_memory, args=(process, phases, stop_event), daemon=True)
+    sampler.start()
+    try:
+        while True:
+            raw_line = await process.stdout.readline()
+            if not raw_line:
+                break
+            line = raw_line.decode(errors='replace')
+            _track_phase(phases, line, time.perf_counter() - clock)
+            if on_output:
+                callback_result = on_output(line.rstrip('\n'))
+                if inspect.isawaitable(callback_result):
+                    await callback_result
+        returncode = await process.wait()
+    except BaseException:
+        await asyncio.shield(_terminate(process))
+        raise
+    finally:
+        stop_event.set()
+        sampler.join()
+    trace = _finish_trace(
+        context['command'], started, phases, time.perf_counter() - clock, returncode, context['config'].trace_path
+    )
+    return returncode, trace
+
+async def package_project_async(config=None, on_output=None, timeout=None, semaphore=None, **options):
+    """
+    Package a project without blocking the event loop.
+
+    PyInstaller runs as an asyncio subprocess whose output is streamed line by line.
+    Cache lookups, import analysis and other file system work run in a worker thread.
+    Cancelling the task, or exceeding timeout, terminates the PyInstaller child and
+    the tools it spawned (and kills them if PyInstaller does not exit within a few seconds).
+    A cancelled task still waits for a file system step already running in its thread.
+
+    Parameters:
+        config (BuildConfig, optional): The build configuration; built from **options when omitted.
+        on_output (callable, optional): Called (or awaited, for coroutine functions) with every output line.
+        timeout (float, optional): Maximum duration of the PyInstaller run in seconds.
+        semaphore (asyncio.Semaphore, optional): Limits how many builds run at the same time.
+        **options: package_project options used when config is omitted.
+
+    Returns:
+        BuildResult: The exit code, artifacts, sizes and timings of the build.
+
+    Raises:
+        asyncio.TimeoutError: The build did not finish within timeout.
+    """
+    config = config or BuildConfig(**options)
+    if semaphore:
+        async with semaphore:
+            return await package_project_async(config, on_output, timeout)
+    result, context = await _run_build_step(_prepare_build, config)
+    if result:
+        return result
+    returncode, trace = await asyncio.wait_for(_stream_pyinstaller(context, on_output), timeout)
+    return await _run_build_step(_finish_build, context, returncode, trace)
+
+async def stream_build(config, timeout=None, semaphore=None):
+    """
+    Package a project, yielding its output lines as they arrive and the BuildResult as the final item.
+
+    Stopping the iteration early (or cancelling the consuming task) terminates the build.
+    """
+    # A bounded queue makes PyInstaller's output wait for a slow consumer instead of piling up
+    queue = asyncio.Queue(maxsize=1000)
+    task = asyncio.ensure_future(package_project_async(config, queue.put, timeout, semaphore))
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                break
+            yield getter.result()
+        while not queue.empty():
+            yield queue.get_nowait()
+        yield await task
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+async def package_projects_async(configs, concurrency=None, on_output=None, timeout=None):
+    """
+    Package many projects from one event loop with at most concurrency builds running at once.
+
+    Parameters:
+        configs (list): BuildConfig objects to build.
+        concurrency (int, optional): Maximum number of concurrent builds (defaults to the number of CPU cores).
+        on_output (callable, optional): Called with (config, line) for every output line.
+        timeout (float, optional): Maximum duration of each PyInstaller run in seconds.
+
+    Returns:
+        list: A BuildResult, or the exception raised by that build, per configuration.
+    """
+    semaphore = asyncio.Semaphore(concurrency or os.cpu_count() or 1)
+
+    def callback_for(config):
+        if on_output is None:
+            return None
+        return lambda line: on_output(config, line)
+
+    return await asyncio.gather(
+        *(package_project_async(config, callback_for(config), timeout, semaphore) for config in configs),
+        return_exceptions=True
+    )
 
 def package_project(
     selected_path, is_directory, output_dir=None, include=None, pyinstaller_args=None,
@@ -16,7 +2774,9 @@ def package_project(
     app_version=None, additional_files=None, user_hooks=None, file_version=None,
     custom_library=None, upx_path=None, no_confirm=False, custom_commands=None,
     freeze_imports=None, clean_build=None, warn_project_version=None,
-    warn_no_version=None, name=None
+    warn_no_version=None, name=None, use_cache=True, cache_dir=None, cache_max_size=None,
+    incremental=False, analyze=False, trace_path=None, shared_runtime=None, compression_policy=None,
+    precompile=False, optimize=0, reproducible=False
 ):
     """
     Package a Python project into an executable using PyInstaller.
@@ -42,7 +2802,8 @@ def package_project(
         manifest (str, optional): Custom manifest file.
         splash (str, optional): Splash screen file.
         runtime_hooks (str, optional): Runtime hooks file.
-        exe_format (str, optional): Specify whether to generate a single executable ('exe') or a directory with bundled files ('directory').
+        exe_format (str, optional): Specify whether to generate a single executable ('exe'), a directory with bundled files ('directory')
+            or a single executable that unpacks its native files once into a per-user cache ('lazy', not on Windows).
         system_path (str, optional): Additional paths to include in the system PATH environment variable.
         upx_level (int, optional): Specify the UPX compression level.
         eula (str, optional): End User License Agreement (EULA) file.
@@ -79,156 +2840,728 @@ def package_project(
         warn_project_version (bool, optional): Enable warnings for project version mismatches.
         warn_no_version (bool, optional): Enable warnings for missing version information.
         name (str, optional): Custom name for the packaged executable.
+        use_cache (bool, optional): Restore unchanged builds from the build cache instead of running PyInstaller.
+        cache_dir (str, optional): Location of the build cache.
+        cache_max_size (int, optional): Maximum size of the build cache in bytes.
+        incremental (bool, optional): Reuse a stable PyInstaller work directory across builds, only starting
+            from scratch when the options, the environment or the set of input files changed.
+        analyze (bool, optional): Statically analyze the project's imports to add computed hidden imports
+            and exclude installed packages the project can never import.
+        trace_path (str, optional): Write a JSON and Chrome trace-event timing trace of the build phases.
+        shared_runtime (str, optional): Content-addressed store that identical files of onedir builds are linked into.
+        compression_policy (str, optional): Strip/UPX each collected binary individually to 'min-size',
+            'min-startup' or 'balanced' instead of applying UPX to everything.
+        precompile (bool, optional): Compile the project sources to bytecode in parallel before PyInstaller
+            runs, reporting compile errors early, using a persistent .pyc cache shared between builds.
+        optimize (int, optional): Bytecode optimization level (0, 1 or 2; 2 also strips docstrings).
+        reproducible (bool, optional): Build byte-identical artifacts from identical sources and write a content manifest next to each.
+
+    Returns:
+        list: Paths of the packaged artifacts, or None if packaging failed.
     """
+    # The parameters map one-to-one onto BuildConfig fields
+    options = dict(locals())
     try:
-        # Construct PyInstaller command based on platform
-        pyinstaller_command = ["pyinstaller"]
-        if platform.system() == 'Windows':
-            if exe_format == 'exe':
-                pyinstaller_command.append("--onefile")
-            else:
-                pyinstaller_command.append("--onedir")
-        elif platform.system() == 'Darwin':  # macOS
-            pyinstaller_command.append("--onefile")
-            pyinstaller_command.append("--osx-bundle-identifier=com.example.app")
-            pyinstaller_command.append("--osx-bundle-name=AppName")
-        elif platform.system() == 'Linux':
-            if exe_format == 'exe':
-                pyinstaller_command.append("--onefile")
-            else:
-                pyinstaller_command.append("--onedir")
-            pyinstaller_command.append("--linux-bundle-name=AppName")
-
-        # Append optional arguments to PyInstaller command
-        if output_dir:
-            pyinstaller_command.extend(["--distpath", output_dir])
-        if include:
-            pyinstaller_command.extend(["--add-data", include])
-        if pyinstaller_args:
-            pyinstaller_command.extend(pyinstaller_args.split())
-        if output_name:
-            pyinstaller_command.extend(["--name", output_name])
-        if clean:
-            pyinstaller_command.append("--clean")
-        if icon:
-            pyinstaller_command.extend(["--icon", icon])
-        if hidden_imports:
-            pyinstaller_command.extend(["--hidden-import", hidden_imports])
-        if version:
-            pyinstaller_command.extend(["--version-file", version])
-        if binaries:
-            pyinstaller_command.extend(["--add-binary", binaries])
-        if license:
-            pyinstaller_command.extend(["--license", license])
-        if env_vars:
-            for var in env_vars.split(','):
-                pyinstaller_command.extend(["--set-env", var])
-        if python:
-            pyinstaller_command.extend(["--python", python])
-        if not compress:
-            pyinstaller_command.append("--noupx")
-        if hooks:
-            pyinstaller_command.extend(["--additional-hooks-dir", hooks])
-        if bootloader:
-            pyinstaller_command.extend(["--bootloader-path", bootloader])
-        if manifest:
-            pyinstaller_command.extend(["--manifest", manifest])
-        if splash:
-            pyinstaller_command.extend(["--splash", splash])
-        if runtime_hooks:
-            pyinstaller_command.extend(["--runtime-hook", runtime_hooks])
-        if system_path:
-            pyinstaller_command.extend(["--paths", system_path])
-        if upx_level:
-            pyinstaller_command.extend(["--upx", f"--upx-level={upx_level}"])
-        if eula:
-            pyinstaller_command.extend(["--eula", eula])
-        if spec_file:
-            pyinstaller_command.extend(["--specpath", spec_file])
-        if runtime_hook_spec:
-            pyinstaller_command.extend(["--runtime-hook-spec", runtime_hook_spec])
-        if template:
-            pyinstaller_command.extend(["--template", template])
-        if compile_pyc:
-            pyinstaller_command.append("--compile")
-        if icon_mac:
-            pyinstaller_command.extend(["--osx-bundle-icon", icon_mac])
-        if package_data:
-            pyinstaller_command.extend(["--package-data", package_data])
-        if build_mode:
-            pyinstaller_command.extend(["--mode", build_mode])
-        if custom_hooks:
-            pyinstaller_command.extend(["--hooks-path", custom_hooks])
-        if custom_upx:
-            pyinstaller_command.extend(["--upx-dir", custom_upx])
-        #if bundle_stdlib:
-            #pyinstaller_command.append("--no-strippython")
-        if exclude:
-            pyinstaller_command.extend(["--exclude", exclude])
-        if bootloader_conf:
-            pyinstaller_command.extend(["--bootloader-conf", bootloader_conf])
-        if verbose:
-            pyinstaller_command.append("--log-level=DEBUG")
-        if external_modules:
-            pyinstaller_command.extend(["--ext-module", external_modules])
-        if bundled_icon:
-            pyinstaller_command.extend(["--icon", bundled_icon])
-        if temp_dir:
-            pyinstaller_command.extend(["--workpath", temp_dir])
-        if upx_conf:
-            pyinstaller_command.extend(["--upx-conf", upx_conf])
-        if resource_files:
-            pyinstaller_command.extend(["--resource", resource_files])
-        if app_name:
-            pyinstaller_command.extend(["--appname", app_name])
-        if log_dir:
-            pyinstaller_command.extend(["--logfile", log_dir])
-        if app_version:
-            pyinstaller_command.extend(["--version", app_version])
-        if additional_files:
-            pyinstaller_command.extend(["--add-data", additional_files])
-        if user_hooks:
-            pyinstaller_command.extend(["--user-hooks", user_hooks])
-        if file_version:
-            pyinstaller_command.extend(["--file-version", file_version])
-        if custom_library:
-            pyinstaller_command.extend(["--custom-library", custom_library])
-        if upx_path:
-            pyinstaller_command.extend(["--upx-path", upx_path])
-
-        if custom_commands:
-            pyinstaller_command.extend(custom_commands.split())
-
-        if freeze_imports:
-            pyinstaller_command.append("--no-packing")
-
-        if clean_build:
-            pyinstaller_command.append("--clean-build")
-
-        if warn_project_version:
-            pyinstaller_command.append("--warn-project")
-
-        if warn_no_version:
-            pyinstaller_command.append("--warn-no-version")
-
-        if name:
-            pyinstaller_command.extend(["--name", name])
-
-        # Execute PyInstaller command
-        if is_directory:
-            pyinstaller_command.append(selected_path)
+        result = run(BuildConfig(**options))
+        return result.artifacts if result.ok else None
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+        return None
+
+
+def load_batch_manifest(manifest_path):
+    """
+    Load a batch manifest and resolve it into one set of package_project options per target.
+
+    The manifest has an optional [defaults] table shared by every target and one
+    [[target]] table per build. Keys are package_project parameter names, plus
+    'path' (the script or directory) and 'directory' (is_directory). Relative
+    paths in every path-valued option (including the sources of data specifications)
+    are resolved against the manifest's directory, which is also the directory
+    targets are built from. Targets whose names derive from the same file name and
+    share an output directory are renamed 'name-N'; explicitly named clashes are an error.
+
+    Parameters:
+        manifest_path (str): Path to the TOML (or JSON) manifest.
+
+    Returns:
+        list: (target name, options) tuples in manifest order.
+    """
+    manifest = load_config_file(manifest_path)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    defaults = manifest.get('defaults', {})
+    valid_options = set(inspect.signature(package_project).parameters)
+    targets = []
+    seen_names = set()
+    artifacts = {}
+    for index, target in enumerate(manifest.get('target', [])):
+        options = dict(defaults, **target)
+        if 'path' not in options:
+            raise ValueError(f"Batch target #{index + 1} has no 'path'")
+        options['selected_path'] = os.path.join(base_dir, options.pop('path'))
+        options['is_directory'] = options.pop('directory', os.path.isdir(options['selected_path']))
+        unknown = set(options) - valid_options
+        if unknown:
+            raise ValueError(f"Batch target #{index + 1} has unknown options: {', '.join(sorted(unknown))}")
+        _resolve_option_paths(options, base_dir)
+
+        explicit_name = options.get('name') or options.get('output_name')
+        target_name = explicit_name or os.path.splitext(os.path.basename(os.path.normpath(options['selected_path'])))[0]
+        options['output_dir'] = os.path.normpath(options.get('output_dir') or os.path.join(base_dir, 'dist'))
+        clash = artifacts.get((target_name, options['output_dir']))
+        if clash and explicit_name:
+            raise ValueError(
+                f"Batch targets #{clash} and #{index + 1} both build '{target_name}' into {options['output_dir']}; "
+                "give one of them another 'name' or 'output_dir'"
+            )
+        if target_name in seen_names:
+            target_name = f"{target_name}-{index + 1}"
+        if clash:
+            # a/main.py and b/main.py would otherwise overwrite each other's executable
+            options['name'] = target_name
+        seen_names.add(target_name)
+        artifacts[(target_name, options['output_dir'])] = index + 1
+
+        # Every build gets its own work and spec directories so concurrent builds never collide
+        target_dir = os.path.join(base_dir, 'build', 'batch', target_name)
+        options['temp_dir'] = options.get('temp_dir') or os.path.join(target_dir, 'work')
+        options['spec_file'] = options.get('spec_file') or os.path.join(target_dir, 'spec')
+        options['no_confirm'] = True
+        targets.append((target_name, options))
+    return targets
+
+# package_project options holding a file or directory path, resolved against a config file's or batch manifest's directory
+PATH_OPTIONS = INPUT_PATH_OPTIONS + (
+    'custom_upx', 'upx_path', 'log_dir', 'cache_dir', 'trace_path', 'shared_runtime', 'output_dir', 'temp_dir', 'spec_file',
+)
+
+def _resolve_option_paths(options, base_dir):
+    """
+    Resolve the relative paths in a dictionary of package_project options against base_dir, in place.
+    """
+    for option in PATH_OPTIONS:
+        if options.get(option):
+            options[option] = os.path.join(base_dir, options[option])
+    for option in DATA_SPEC_OPTIONS:
+        if options.get(option):
+            options[option] = _resolve_data_spec(options[option], base_dir)
+    if options.get('system_path'):
+        options['system_path'] = os.pathsep.join(
+            os.path.join(base_dir, path) for path in options['system_path'].split(os.pathsep)
+        )
+
+def _resolve_data_spec(spec, base_dir):
+    """
+    Resolve the source path of a 'source:destination' data specification against base_dir.
+    """
+    source = _data_source(spec)
+    return os.path.join(base_dir, source) + spec[len(source):]
+
+def _run_batch_target(target_name, options, log_path, cwd=None):
+    """
+    Package a single batch target with its output redirected to log_path.
+
+    Runs inside a worker process of the batch pool, from cwd when given, so that
+    directory targets never depend on the directory the batch was started from.
+    """
+    if cwd:
+        os.chdir(cwd)
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = os.dup(1), os.dup(2)
+    start = time.perf_counter()
+    with open(log_path, 'w') as log:
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        try:
+            artifacts = package_project(**options)
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_fds[0], 1)
+            os.dup2(saved_fds[1], 2)
+            os.close(saved_fds[0])
+            os.close(saved_fds[1])
+    return {
+        'target': target_name,
+        'status': 'ok' if artifacts else 'failed',
+        'seconds': time.perf_counter() - start,
+        'size': sum(_path_size(path) for path in artifacts or []),
+        'log': log_path,
+    }
+
+def run_batch(manifest_path, jobs=None, **overrides):
+    """
+    Package every target of a batch manifest concurrently on a process pool.
+
+    Parameters:
+        manifest_path (str): Path to the TOML (or JSON) manifest.
+        jobs (int, optional): Number of concurrent builds (defaults to the number of CPU cores).
+        **overrides: package_project options applied to every target (e.g. use_cache).
+
+    Returns:
+        list: One result dictionary per target with its status, wall time, artifact size and log path.
+    """
+    targets = load_batch_manifest(manifest_path)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    jobs = jobs or os.cpu_count() or 1
+    print(f"Packaging {len(targets)} targets with {jobs} workers...")
+    start = time.perf_counter()
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(
+                _run_batch_target, target_name, dict(options, **overrides),
+                os.path.join(base_dir, 'build', 'batch', target_name, 'build.log'), base_dir
+            ): target_name
+            for target_name, options in targets
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'target': futures[future], 'status': f"error: {e}", 'seconds': 0.0, 'size': 0, 'log': None}
+            print(f"  [{result['status']}] {result['target']} ({result['seconds']:.1f}s)")
+            results.append(result)
+    order = [target_name for target_name, _ in targets]
+    results.sort(key=lambda result: order.index(result['target']))
+    print_batch_summary(results, time.perf_counter() - start)
+    return results
+
+def print_batch_summary(results, wall_time):
+    """
+    Print a per-target table of status, wall time and artifact size.
+    """
+    width = max([len(result['target']) for result in results] + [6])
+    print()
+    print(f"{'Target':<{width}}  {'Status':<8}  {'Time':>8}  {'Size':>10}")
+    for result in results:
+        print(f"{result['target']:<{width}}  {result['status']:<8}  {result['seconds']:>7.1f}s  "
+              f"{result['size'] / (1024 * 1024):>7.1f} MB")
+    failed = [result for result in results if result['status'] != 'ok']
+    serial_time = sum(result['seconds'] for result in results)
+    print(f"\n{len(results) - len(failed)}/{len(results)} targets packaged in {wall_time:.1f}s "
+          f"(sum of build times: {serial_time:.1f}s)")
+    for result in failed:
+        if result['log']:
+            print(f"  See {result['log']} for the {result['target']} build log")
+
+def _percentile(values, percent):
+    """
+    Return the nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+def _artifact_executable(artifacts, artifact_name):
+    """
+    Return the executable inside a onefile, onedir or macOS bundle artifact.
+    """
+    executable_name = artifact_name + ('.exe' if platform.system() == 'Windows' else '')
+    for artifact in artifacts:
+        candidates = [
+            artifact,
+            os.path.join(artifact, executable_name),
+            os.path.join(artifact, 'Contents', 'MacOS', artifact_name),
+        ]
+        for candidate in candidates:
+            if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+                return candidate
+    return None
+
+def _evict_from_page_cache(path):
+    """
+    Ask the OS to drop the files of an artifact from the page cache so the next launch is cold.
+
+    Best effort: only supported where os.posix_fadvise exists (Linux).
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    for file_path in _iter_all_files(path):
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+    return True
+
+def _launch(executable, args=None, timeout=60):
+    """
+    Run an executable once and return its wall time in seconds and peak RSS in bytes (None if unknown).
+
+    Peak RSS comes from wait4 and covers the whole process tree (including the onefile
+    bootloader's child). On Linux it is never lower than the packager's own resident size,
+    which the child inherits until it executes the artifact. A launch still running
+    after timeout seconds is killed, with everything it spawned, and raises RuntimeError.
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [executable] + (args or []), stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    # The onefile bootloader runs the application in a child, so a hung launch is killed as a group
+    timer = threading.Timer(timeout, _kill_process_group, (process,))
+    timer.start()
+    try:
+        if hasattr(os, 'wait4'):
+            _, status, usage = os.wait4(process.pid, 0)
+            elapsed = time.perf_counter() - start
+            process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+            # ru_maxrss is in kilobytes on Linux and bytes on macOS
+            peak_rss = usage.ru_maxrss if platform.system() == 'Darwin' else usage.ru_maxrss * 1024
         else:
-            file_directory = os.path.dirname(selected_path)
-            pyinstaller_command.extend(["--name", os.path.basename(selected_path).split(".")[0], selected_path])
-            os.chdir(file_directory)
+            process.wait()
+            elapsed = time.perf_counter() - start
+            peak_rss = None
+    finally:
+        timer.cancel()
+    if elapsed >= timeout:
+        _kill_process_group(process)
+        raise RuntimeError(f"{executable} did not exit within {timeout}s")
+    if process.returncode != 0:
+        raise RuntimeError(f"{executable} exited with code {process.returncode}")
+    return elapsed, peak_rss
 
-        if no_confirm:
-            pyinstaller_command.append("--noconfirm")
+def benchmark_variants(upx_levels=('none', 'default'), compile_pyc_options=(False,), exe_formats=('exe', 'directory')):
+    """
+    Return the matrix of package_project settings to benchmark.
 
-        subprocess.run(pyinstaller_command)
-        print("Project packaged successfully!")
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
+    Parameters:
+        upx_levels (list, optional): 'none' (no UPX), 'default' (UPX with its default level) or levels 1-9.
+        compile_pyc_options (list, optional): Values of compile_pyc to try.
+        exe_formats (list, optional): Values of exe_format to try.
+
+    Returns:
+        list: (variant name, package_project options) tuples.
+    """
+    variants = []
+    for exe_format, upx, compile_pyc in itertools.product(exe_formats, upx_levels, compile_pyc_options):
+        options = {'exe_format': exe_format, 'compile_pyc': compile_pyc, 'compress': upx != 'none', 'upx_level': None}
+        if upx not in ('none', 'default'):
+            options['upx_level'] = int(upx)
+        upx_label = 'noupx' if upx == 'none' else 'upx' if upx == 'default' else f"upx{upx}"
+        layout = {'exe': 'onefile', 'directory': 'onedir'}.get(exe_format, exe_format)
+        name = f"{layout}-{upx_label}" + ('-pyc' if compile_pyc else '')
+        variants.append((name, options))
+    return variants
+
+def run_benchmark(selected_path, is_directory, runs=10, variants=None, launch_args=None, report_path='benchmark.json',
+                  benchmark_dir=None, **options):
+    """
+    Build a project under a matrix of packaging settings and measure the startup cost of each artifact.
+
+    Every variant is built from scratch into its own directory, launched once (for lazy
+    onefile executables this includes unpacking into the per-user cache), then runs times
+    cold (with the artifact evicted from the page cache where the OS allows it) and runs
+    times warm. Results are written as JSON or CSV depending on report_path's extension.
+
+    Parameters:
+        selected_path (str): Path to the Python project directory or script file.
+        is_directory (bool): Indicates whether the provided path is a directory.
+        runs (int, optional): Number of cold and of warm launches per variant.
+        variants (list, optional): (name, options) tuples as returned by benchmark_variants.
+        launch_args (list, optional): Arguments passed to the executable on every launch.
+        report_path (str, optional): Output file for the report (.json or .csv).
+        benchmark_dir (str, optional): Directory for the variant builds (defaults to build/benchmark).
+        **options: Other package_project options shared by every variant.
+
+    Returns:
+        list: One result dictionary per variant.
+    """
+    benchmark_dir = os.path.abspath(benchmark_dir or os.path.join('build', 'benchmark'))
+    results = []
+    for variant_name, variant_options in variants or benchmark_variants():
+        variant_dir = os.path.join(benchmark_dir, variant_name)
+        shutil.rmtree(variant_dir, ignore_errors=True)
+        build_options = dict(options, **variant_options)
+        build_options.update(
+            output_dir=os.path.join(variant_dir, 'dist'), temp_dir=os.path.join(variant_dir, 'work'),
+            spec_file=os.path.join(variant_dir, 'spec'), use_cache=False, incremental=False, no_confirm=True,
+        )
+        print(f"Benchmarking {variant_name}...")
+        start = time.perf_counter()
+        artifacts = package_project(selected_path, is_directory, **build_options)
+        result = {'variant': variant_name, 'build_seconds': time.perf_counter() - start}
+        result.update({key: variant_options[key] for key in ('exe_format', 'compress', 'upx_level', 'compile_pyc')})
+        executable = _artifact_executable(artifacts or [], os.path.basename(artifacts[0]).split('.')[0]) if artifacts else None
+        if not executable:
+            result['error'] = "build failed or produced no executable"
+            results.append(result)
+            continue
+        result['size'] = sum(_path_size(path) for path in artifacts)
+        runtime_dir = lazy_runtime_dir(executable) if variant_options['exe_format'] == 'lazy' else None
+        cold, warm, peak_rss = [], [], []
+        try:
+            if runtime_dir:
+                # Measure the one-time unpacking, not an entry left by an earlier run
+                shutil.rmtree(os.path.realpath(runtime_dir), ignore_errors=True)
+                if os.path.islink(runtime_dir):
+                    os.remove(runtime_dir)
+            result['first_launch'], _ = _launch(executable, launch_args)
+            for _ in range(runs):
+                for artifact in artifacts + ([os.path.realpath(runtime_dir)] if runtime_dir else []):
+                    _evict_from_page_cache(artifact)
+                elapsed, rss = _launch(executable, launch_args)
+                cold.append(elapsed)
+                peak_rss.append(rss)
+                elapsed, rss = _launch(executable, launch_args)
+                warm.append(elapsed)
+                peak_rss.append(rss)
+        except (OSError, RuntimeError, subprocess.SubprocessError) as e:
+            result['error'] = str(e)
+        for label, samples in (('cold', cold), ('warm', warm)):
+            for percent in (50, 90, 99):
+                result[f"{label}_p{percent}"] = _percentile(samples, percent)
+            result[f"{label}_mean"] = sum(samples) / len(samples) if samples else None
+        known_rss = [rss for rss in peak_rss if rss is not None]
+        result['peak_rss'] = max(known_rss) if known_rss else None
+        results.append(result)
+
+    compare_to_onefile(results)
+    write_benchmark_report(results, report_path)
+    print_benchmark_summary(results)
+    print(f"Benchmark report written to {report_path}")
+    return results
+
+def compare_to_onefile(results):
+    """
+    Add the startup speedup against the standard onefile layout to every lazy onefile result.
+
+    Each lazy variant is compared with the onefile variant built with the same UPX and
+    bytecode settings; the ratios are stored as 'onefile_cold_speedup' and 'onefile_warm_speedup'.
+    """
+    settings = ('compress', 'upx_level', 'compile_pyc')
+    onefile = {
+        tuple(result[key] for key in settings): result
+        for result in results if result['exe_format'] == 'exe' and result.get('cold_p50')
+    }
+    for result in results:
+        baseline = onefile.get(tuple(result[key] for key in settings))
+        if result['exe_format'] != 'lazy' or not baseline or not result.get('cold_p50'):
+            continue
+        for label in ('cold', 'warm'):
+            result[f"onefile_{label}_speedup"] = baseline[f"{label}_p50"] / result[f"{label}_p50"]
+
+def _write_rows(rows, path):
+    """
+    Write a list of dictionaries as a CSV file with the union of their keys as columns.
+    """
+    fields = []
+    for row in rows:
+        fields.extend(key for key in row if key not in fields)
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def write_benchmark_report(results, report_path):
+    """
+    Write benchmark results to a JSON or CSV file.
+    """
+    if report_path.endswith('.csv'):
+        _write_rows(results, report_path)
+    else:
+        with open(report_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+def print_benchmark_summary(results):
+    """
+    Print a table of startup latency, memory, size and build time per variant, fastest cold start first.
+    """
+    def milliseconds(seconds):
+        return f"{seconds * 1000:.0f}ms" if seconds is not None else "-"
+
+    width = max([len(result['variant']) for result in results] + [7])
+    print()
+    print(f"{'Variant':<{width}}  {'Cold p50':>9}  {'Cold p90':>9}  {'Warm p50':>9}  {'Warm p90':>9}  "
+          f"{'Peak RSS':>9}  {'Size':>9}  {'Build':>7}")
+    ranked = sorted(results, key=lambda result: (result.get('cold_p50') is None, result.get('cold_p50') or 0))
+    for result in ranked:
+        if result.get('cold_p50') is None:
+            print(f"{result['variant']:<{width}}  {result.get('error', 'no samples')}")
+            continue
+        rss = f"{result['peak_rss'] / (1024 * 1024):.1f} MB" if result['peak_rss'] else "-"
+        print(f"{result['variant']:<{width}}  {milliseconds(result['cold_p50']):>9}  {milliseconds(result['cold_p90']):>9}  "
+              f"{milliseconds(result['warm_p50']):>9}  {milliseconds(result['warm_p90']):>9}  {rss:>9}  "
+              f"{result['size'] / (1024 * 1024):>6.1f} MB  {result['build_seconds']:>6.1f}s")
+    for result in results:
+        if 'onefile_warm_speedup' in result:
+            print(f"{result['variant']}: {result['onefile_cold_speedup']:.2f}x cold and {result['onefile_warm_speedup']:.2f}x "
+                  f"warm startup speedup over standard onefile (p50), first launch {result['first_launch'] * 1000:.0f}ms")
+
+def parse_importtime(output):
+    """
+    Parse the output of python -X importtime.
+
+    Returns:
+        list: One dictionary per imported module with 'module', 'self' and 'cumulative'
+        (microseconds), 'level' (nesting depth) and 'importer' (the module whose import
+        triggered it, None at the top level).
+    """
+    records = []
+    for line in output.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if match:
+            records.append({
+                'module': match.group(4), 'self': int(match.group(1)), 'cumulative': int(match.group(2)),
+                'level': len(match.group(3)) // 2, 'importer': None,
+            })
+    # Imports are reported children first, so a module's importer is the next record on a lower level
+    pending = []
+    for index, record in enumerate(records):
+        while pending and records[pending[-1]]['level'] > record['level']:
+            records[pending.pop()]['importer'] = record['module']
+        pending.append(index)
+    return records
+
+def _module_source(root, dotted_name):
+    """
+    Return the source file of a local or installed module without importing it, or None.
+    """
+    local_path = _local_module_path(root, dotted_name)
+    if local_path:
+        return local_path
+    top_level, _, rest = dotted_name.partition('.')
+    try:
+        spec = importlib.util.find_spec(top_level)
+    except (ImportError, ValueError):
+        return None
+    if not spec or not spec.origin or not spec.origin.endswith('.py'):
+        return None
+    if not rest:
+        return spec.origin
+    return _local_module_path(os.path.dirname(spec.origin), rest)
+
+def _is_installed_package(dotted_name):
+    """
+    Return whether a module belongs to an installed third-party package rather than the standard library.
+    """
+    top_level = dotted_name.partition('.')[0]
+    if _is_stdlib_module(top_level):
+        return False
+    try:
+        return importlib.util.find_spec(top_level) is not None
+    except (ImportError, ValueError):
+        return False
+
+@functools.lru_cache(maxsize=None)
+def _is_stdlib_module(top_level):
+    """
+    Return whether a top-level module belongs to the standard library.
+
+    sys.stdlib_module_names only exists on Python 3.10+; older interpreters check whether
+    the module is found in the standard library directory, outside of site-packages.
+    """
+    names = getattr(sys, 'stdlib_module_names', None)
+    if names is not None:
+        return top_level in names
+    if top_level in sys.builtin_module_names:
+        return True
+    try:
+        spec = importlib.util.find_spec(top_level)
+    except (ImportError, ValueError):
+        return False
+    if spec is None:
+        return False
+    if spec.origin in ('built-in', 'frozen'):
+        return True
+    location = spec.origin or next(iter(spec.submodule_search_locations or ()), None)
+    if not location:
+        return False
+    location = os.path.realpath(location)
+    paths = sysconfig.get_paths()
+
+    def inside(key):
+        return location.startswith(os.path.join(os.path.realpath(paths[key]), ''))
+
+    # site-packages usually lives inside the standard library directory
+    return (inside('stdlib') or inside('platstdlib')) and not (inside('purelib') or inside('platlib'))
+
+def _import_sites(path):
+    """
+    Return where a source file imports each module: 'top' (module level), 'function' or 'guarded'.
+
+    'guarded' imports sit in a try block catching ImportError, so the file copes without
+    the module. A module imported in several places gets the most binding kind.
+    """
+    try:
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), path)
+    except (OSError, SyntaxError, ValueError):
+        return {}
+    rank = {'guarded': 0, 'function': 1, 'top': 2}
+    sites = {}
+
+    def visit(nodes, context):
+        for node in nodes:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                if isinstance(node, ast.Import):
+                    modules = [alias.name for alias in node.names]
+                elif node.level or not node.module:
+                    modules = []
+                else:
+                    modules = [node.module] + [f"{node.module}.{alias.name}" for alias in node.names if alias.name != '*']
+                for module in modules:
+                    if module not in sites or rank[context] > rank[sites[module]]:
+                        sites[module] = context
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+                visit(ast.iter_child_nodes(node), 'guarded' if context == 'guarded' else 'function')
+            elif isinstance(node, ast.Try) and any(_catches_import_error(handler) for handler in node.handlers):
+                visit(node.body, 'guarded')
+                visit(node.handlers + node.orelse + node.finalbody, context)
+            else:
+                visit(ast.iter_child_nodes(node), context)
+
+    visit(tree.body, 'top')
+    return sites
+
+def _import_site(sites, module):
+    """
+    Return how a module is imported according to _import_sites, counting imports of its submodules.
+    """
+    kinds = [kind for name, kind in sites.items() if name == module or name.startswith(module + '.')]
+    for kind in ('top', 'function', 'guarded'):
+        if kind in kinds:
+            return kind
+    return None
+
+def profile_imports(selected_path, is_directory, runs=5, launch_args=None, python=None, min_cost=DEFAULT_MIN_IMPORT_COST):
+    """
+    Profile the import time of a project and suggest how to cut it.
+
+    The project is run from source runs times (after one warm-up run) under
+    python -X importtime. Modules the bare interpreter imports at startup are
+    attributed to the interpreter. The median self and cumulative cost of every
+    other module is ranked. Modules whose median cumulative cost reaches min_cost
+    get a suggestion, based on how their importer imports them:
+
+    - 'lazy-import': the project imports it at module level; importing it where it is used defers the cost.
+    - 'pre-warm': the project imports it inside a function that ran; importing it in a background
+      thread from a runtime hook overlaps the cost with startup.
+    - 'exclude': a dependency imports this installed third-party package in a try block
+      catching ImportError, so the application still runs when it is left out of the bundle.
+
+    Parameters:
+        selected_path (str): Path to the Python project directory (with a __main__.py) or script file.
+        is_directory (bool): Indicates whether the provided path is a directory.
+        runs (int, optional): Number of profiled runs.
+        launch_args (list, optional): Arguments passed to the project on every run.
+        python (str, optional): Interpreter to run the project with (defaults to the current one).
+        min_cost (int, optional): Minimum median cumulative cost in microseconds of a module to get a suggestion.
+
+    Returns:
+        dict: 'runs', 'total' (median microseconds spent importing), 'modules' (ranked
+        dictionaries with 'module', 'importer', 'self', 'cumulative', 'share', 'seen' and
+        'suggestion') and 'suggestions' (suggestion kind to module names).
+    """
+    python = python or sys.executable
+    selected_path = os.path.abspath(selected_path)
+    root = selected_path if is_directory else os.path.dirname(selected_path)
+    main_path = os.path.join(selected_path, '__main__.py') if is_directory else selected_path
+    if not os.path.isfile(main_path):
+        raise ValueError(f"Import profiling needs a script or a directory with a __main__.py, not {selected_path}")
+
+    def profile(arguments):
+        completed = subprocess.run(
+            [python, '-X', 'importtime'] + arguments, cwd=root, stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors='replace', timeout=300,
+        )
+        if completed.returncode != 0:
+            print(f"Warning: {' '.join(arguments[:1])} exited with code {completed.returncode} while profiling")
+        return parse_importtime(completed.stderr)
+
+    interpreter_modules = {record['module'] for record in profile(['-c', 'pass'])}
+    target = [selected_path] + list(launch_args or [])
+    profile(target)
+    samples = {}
+    totals = []
+    for _ in range(runs):
+        records = profile(target)
+        totals.append(sum(record['cumulative'] for record in records if record['level'] == 0 and record['module'] not in interpreter_modules))
+        for record in records:
+            if record['level'] == 0 and record['module'] in interpreter_modules:
+                continue
+            sample = samples.setdefault(record['module'], {'self': [], 'cumulative': [], 'importer': record['importer']})
+            sample['self'].append(record['self'])
+            sample['cumulative'].append(record['cumulative'])
+
+    total = _percentile(totals, 50) or 0
+    site_cache = {}
+    modules = []
+    for module, sample in samples.items():
+        cumulative = _percentile(sample['cumulative'], 50)
+        importer = sample['importer'] or '__main__'
+        entry = {
+            'module': module, 'importer': importer, 'self': _percentile(sample['self'], 50),
+            'cumulative': cumulative, 'share': cumulative / total if total else 0.0,
+            'seen': len(sample['cumulative']), 'suggestion': None,
+        }
+        if cumulative >= min_cost and not _local_module_path(root, module):
+            importer_path = main_path if importer == '__main__' else _module_source(root, importer)
+            if importer_path not in site_cache:
+                site_cache[importer_path] = _import_sites(importer_path) if importer_path else {}
+            site = _import_site(site_cache[importer_path], module)
+            first_party = importer == '__main__' or _local_module_path(root, importer) is not None
+            if first_party and site == 'top':
+                entry['suggestion'] = 'lazy-import'
+            elif first_party and site == 'function':
+                entry['suggestion'] = 'pre-warm'
+            elif not first_party and site == 'guarded' and _is_installed_package(module):
+                entry['suggestion'] = 'exclude'
+        modules.append(entry)
+    modules.sort(key=lambda entry: entry['cumulative'], reverse=True)
+    suggestions = {kind: [entry['module'] for entry in modules if entry['suggestion'] == kind] for kind in ('exclude', 'lazy-import', 'pre-warm')}
+    return {'python': python, 'runs': runs, 'total': total, 'modules': modules, 'suggestions': suggestions}
+
+def write_import_profile(profile, report_path):
+    """
+    Write an import profile as JSON, or its ranked module table as CSV, and the pre-warm runtime hook next to it.
+
+    Returns:
+        str: Path of the pre-warm runtime hook, or None when nothing is worth pre-warming.
+    """
+    if report_path.endswith('.csv'):
+        _write_rows(profile['modules'], report_path)
+    else:
+        with open(report_path, 'w') as f:
+            json.dump(profile, f, indent=2)
+    if not profile['suggestions']['pre-warm']:
+        return None
+    hook_path = os.path.join(os.path.dirname(os.path.abspath(report_path)), 'prewarm_imports.py')
+    with open(hook_path, 'w') as f:
+        f.write(PREWARM_HOOK.format(modules=profile['suggestions']['pre-warm']))
+    return hook_path
+
+def print_import_profile(profile, hook_path=None, limit=15):
+    """
+    Print the most expensive imports of an import profile and the resulting suggestions.
+    """
+    print(f"Import profile: {profile['total'] / 1000:.1f}ms importing (median of {profile['runs']} runs)")
+    width = max([len(entry['module']) for entry in profile['modules'][:limit]] + [6])
+    print(f"{'Module':<{width}}  {'Cumulative':>10}  {'Self':>8}  {'Share':>6}  Suggestion")
+    for entry in profile['modules'][:limit]:
+        print(f"{entry['module']:<{width}}  {entry['cumulative'] / 1000:>8.1f}ms  {entry['self'] / 1000:>6.1f}ms  "
+              f"{entry['share']:>6.1%}  {entry['suggestion'] or ''}")
+    suggestions = profile['suggestions']
+    if suggestions['exclude']:
+        print(f"  Exclude (optional imports of dependencies): {', '.join(suggestions['exclude'])}")
+        print(f"    -a \"{' '.join(f'--exclude-module {module}' for module in suggestions['exclude'])}\"")
+    if suggestions['lazy-import']:
+        print(f"  Lazy-import (imported at module level by the project): {', '.join(suggestions['lazy-import'])}")
+    if suggestions['pre-warm']:
+        print(f"  Pre-warm (imported on demand by the project): {', '.join(suggestions['pre-warm'])}")
+        if hook_path:
+            print(f"    --runtime-hooks {hook_path}")
 
 def wizard():
     """
@@ -256,7 +3589,7 @@ def wizard():
     manifest = input("Enter the path to a custom manifest file (optional, press Enter to skip): ")
     splash = input("Enter the path to a splash screen file (optional, press Enter to skip): ")
     runtime_hooks = input("Enter the path to a runtime hooks file (optional, press Enter to skip): ")
-    exe_format = input("Specify whether to generate a single executable ('exe') or a directory with bundled files ('directory'): ")
+    exe_format = input("Specify whether to generate a single executable ('exe'), a directory with bundled files ('directory') or a self-caching single executable ('lazy'): ")
     system_path = input("Enter additional paths to include in the system PATH environment variable (optional, press Enter to skip): ")
     upx_level = input("Enter the UPX compression level (0-9, optional, press Enter to skip): ")
     eula = input("Enter the path to an End User License Agreement (EULA) file (optional, press Enter to skip): ")
@@ -295,16 +3628,52 @@ def wizard():
     name = input("Enter a custom name for the packaged executable (optional, press Enter to skip): ")
 
     package_project(
-        selected_path, is_directory, output_dir, include, pyinstaller_args, output_name, clean, icon, hidden_imports,
-        version, binaries, license, env_vars, python, compress, hooks, bootloader, manifest, splash, runtime_hooks,
-        exe_format, system_path, upx_level, eula, spec_file, runtime_hook_spec, template, compile_pyc, icon_mac,
-        package_data, build_mode, custom_hooks, custom_upx, bundle_stdlib, exclude, bootloader_conf, verbose,
-        external_modules, bundled_icon, temp_dir, upx_conf, resource_files, app_name, log_dir, app_version,
-        additional_files, user_hooks, file_version, custom_library, upx_path, no_confirm, custom_commands,
-        freeze_imports, clean_build, warn_project_version, warn_no_version, name
+        selected_path, is_directory, output_dir=output_dir, include=include, pyinstaller_args=pyinstaller_args,
+        output_name=output_name, clean=clean, icon=icon, hidden_imports=hidden_imports, version=version,
+        binaries=binaries, license=license, env_vars=env_vars, python=python, compress=compress, hooks=hooks,
+        bootloader=bootloader, manifest=manifest, splash=splash, runtime_hooks=runtime_hooks,
+        exe_format=exe_format, system_path=system_path, upx_level=upx_level, eula=eula, spec_file=spec_file,
+        runtime_hook_spec=runtime_hook_spec, template=template, compile_pyc=compile_pyc, icon_mac=icon_mac,
+        package_data=package_data, build_mode=build_mode, custom_hooks=custom_hooks, custom_upx=custom_upx,
+        bundle_stdlib=bundle_stdlib, exclude=exclude, bootloader_conf=bootloader_conf, verbose=verbose,
+        external_modules=external_modules, bundled_icon=bundled_icon, temp_dir=temp_dir, upx_conf=upx_conf,
+        resource_files=resource_files, app_name=app_name, log_dir=log_dir, app_version=app_version,
+        additional_files=additional_files, user_hooks=user_hooks, file_version=file_version,
+        custom_library=custom_library, upx_path=upx_path, no_confirm=no_confirm,
+        custom_commands=custom_commands, freeze_imports=freeze_imports, clean_build=clean_build,
+        warn_project_version=warn_project_version, warn_no_version=warn_no_version, name=name
+    )
+
+def _options_from_args(args):
+    """
+    Map parsed command line arguments onto package_project/BuildConfig options.
+    """
+    options = dict(
+        vars(args), selected_path=args.path, is_directory=args.directory,
+        analyze=args.analyze_imports, trace_path=args.build_trace,
+        cache_max_size=args.cache_max_size * 1024 * 1024 if args.cache_max_size else None,
     )
+    field_names = {field.name for field in dataclasses.fields(BuildConfig)}
+    return {key: value for key, value in options.items() if key in field_names}
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ['artifact-diff']:
+        diff_parser = argparse.ArgumentParser(prog="package.py artifact-diff", description="Compare two builds file by file")
+        diff_parser.add_argument("old", help="Artifact file or directory, or its .manifest.json, of the old build")
+        diff_parser.add_argument("new", help="Artifact file or directory, or its .manifest.json, of the new build")
+        diff_parser.add_argument("--json", action="store_true", help="Print the differences as JSON")
+        diff_args = diff_parser.parse_args(sys.argv[2:])
+        try:
+            diff = diff_manifests(load_artifact_manifest(diff_args.old), load_artifact_manifest(diff_args.new))
+        except (OSError, ValueError) as e:
+            print(f"An error occurred: {str(e)}")
+            sys.exit(2)
+        if diff_args.json:
+            print(json.dumps(diff, indent=2))
+        else:
+            print_artifact_diff(diff)
+        sys.exit(1 if diff['added'] or diff['removed'] or diff['changed'] else 0)
+
     parser = argparse.ArgumentParser(description="Kynlos Python Packager")
     parser.add_argument("-w", "--wizard", action="store_true", help="Run the packaging process using a wizard")
     parser.add_argument('path', nargs='?', default=None, help='Path to the project or script to package')
@@ -327,7 +3696,7 @@ if __name__ == "__main__":
     parser.add_argument("--manifest", help="Custom manifest file")
     parser.add_argument("--splash", help="Splash screen file")
     parser.add_argument("--runtime-hooks", help="Runtime hooks file")
-    parser.add_argument("--exe-format", choices=['exe', 'directory'], default='exe', help="Specify whether to generate a single executable ('exe') or a directory with bundled files ('directory')")
+    parser.add_argument("--exe-format", choices=['exe', 'directory', 'lazy'], default='exe', help="Specify whether to generate a single executable ('exe'), a directory with bundled files ('directory') or a single executable that unpacks once into a per-user cache ('lazy')")
     parser.add_argument("--system-path", help="Additional paths to include in the system PATH environment variable")
     parser.add_argument("--upx-level", type=int, choices=range(0, 10), help="Specify the UPX compression level")
     parser.add_argument("--eula", help="End User License Agreement (EULA) file")
@@ -364,26 +3733,113 @@ if __name__ == "__main__":
     parser.add_argument("--warn-project-version", action="store_true", help="Enable warnings for project version mismatches")
     parser.add_argument("--warn-no-version", action="store_true", help="Enable warnings for missing version information")
     parser.add_argument("--name", help="Custom name for the packaged executable")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false", help="Always run PyInstaller instead of restoring unchanged builds from the build cache")
+    parser.add_argument("--cache-dir", help="Location of the build cache")
+    parser.add_argument("--cache-max-size", type=int, help="Maximum size of the build cache in MB (least recently used builds are evicted first)")
+    parser.add_argument("--cache-stats", action="store_true", help="Print build cache statistics and exit")
+    parser.add_argument("--incremental", action="store_true", help="Reuse PyInstaller's work directory across builds and only start from scratch when something relevant changed")
+    parser.add_argument("--analyze-imports", action="store_true", help="Statically analyze imports to compute hidden imports and exclude installed packages that dependencies only import optionally")
+    parser.add_argument("--benchmark", action="store_true", help="Build the target under a matrix of packaging settings and measure startup latency, memory and size")
+    parser.add_argument("--benchmark-runs", type=int, default=10, help="Number of cold and of warm launches per benchmark variant")
+    parser.add_argument("--benchmark-upx-levels", default="none,default", help="Comma-separated UPX settings to benchmark: 'none', 'default' or levels 1-9")
+    parser.add_argument("--benchmark-formats", default="exe,directory", help="Comma-separated exe formats to benchmark: 'exe', 'directory' or 'lazy' (default: exe,directory)")
+    parser.add_argument("--benchmark-compile-pyc", action="store_true", help="Benchmark every variant with and without --compile-pyc")
+    parser.add_argument("--benchmark-args", help="Arguments passed to the executable on every benchmark launch")
+    parser.add_argument("--benchmark-report", default="benchmark.json", help="Benchmark report file (.json or .csv)")
+    parser.add_argument("--build-trace", help="Write a JSON timing trace of the build phases (plus a Chrome trace-event file next to it)")
+    parser.add_argument("--shared-runtime", metavar="STORE", help="Link identical files of onedir builds into a shared content-addressed store")
+    parser.add_argument("--compression-policy", choices=COMPRESSION_POLICIES, help="Decide per binary whether to strip, UPX-compress or leave it, to minimize size or startup latency")
+    parser.add_argument("--precompile", action="store_true", help="Compile the project sources to bytecode in parallel before packaging, reusing a persistent .pyc cache")
+    parser.add_argument("--optimize", type=int, choices=(0, 1, 2), default=0, help="Bytecode optimization level (2 also strips docstrings)")
+    parser.add_argument("--reproducible", action="store_true", help="Build byte-identical artifacts from identical sources and write a content manifest next to each")
+    parser.add_argument("--profile-imports", action="store_true", help="Profile the import time of the project with python -X importtime before packaging")
+    parser.add_argument("--profile-imports-runs", type=int, default=5, help="Number of profiled runs (default: 5)")
+    parser.add_argument("--profile-imports-args", help="Arguments passed to the project on every profiled run")
+    parser.add_argument("--profile-imports-report", default="import-profile.json", help="Import profile report file, .json or .csv (default: import-profile.json)")
+    parser.add_argument("--watch", action="store_true", help="Rebuild automatically whenever the sources or bundled data files change")
+    parser.add_argument("--watch-debounce", type=float, default=0.5, help="Seconds without further changes before a rebuild starts (default: 0.5)")
+    parser.add_argument("--watch-poll", action="store_true", help="Detect changes by polling instead of inotify")
+    parser.add_argument("--batch", metavar="MANIFEST", help="Package every target listed in a TOML manifest concurrently")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of concurrent builds in batch mode (default: number of CPU cores)")
     
     args = parser.parse_args()
 
-    if args.wizard:
+    if args.cache_stats:
+        print_cache_stats(args.cache_dir)
+    elif args.batch:
+        # Only options given on the command line override the manifest
+        overrides = {}
+        if not args.use_cache:
+            overrides['use_cache'] = False
+        if args.cache_dir:
+            overrides['cache_dir'] = args.cache_dir
+        if args.cache_max_size:
+            overrides['cache_max_size'] = args.cache_max_size * 1024 * 1024
+        if args.incremental:
+            overrides['incremental'] = True
+        if args.analyze_imports:
+            overrides['analyze'] = True
+        if args.precompile:
+            overrides['precompile'] = True
+        if args.optimize:
+            overrides['optimize'] = args.optimize
+        if args.compression_policy:
+            overrides['compression_policy'] = args.compression_policy
+        if args.shared_runtime:
+            overrides['shared_runtime'] = os.path.abspath(args.shared_runtime)
+        if args.reproducible:
+            overrides['reproducible'] = True
+        try:
+            results = run_batch(args.batch, args.jobs, **overrides)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"An error occurred: {str(e)}")
+            sys.exit(1)
+        if args.shared_runtime:
+            print()
+            print_shared_runtime_stats(args.shared_runtime)
+        if any(result['status'] != 'ok' for result in results):
+            sys.exit(1)
+    elif args.benchmark:
+        if args.path is None:
+            parser.error("the following arguments are required: path")
+        shared_options = _options_from_args(args)
+        del shared_options['selected_path'], shared_options['is_directory']
+        variants = benchmark_variants(
+            upx_levels=[level.strip() for level in args.benchmark_upx_levels.split(',')],
+            compile_pyc_options=(False, True) if args.benchmark_compile_pyc else (args.compile_pyc,),
+            exe_formats=[exe_format.strip() for exe_format in args.benchmark_formats.split(',')],
+        )
+        run_benchmark(
+            args.path, args.directory, args.benchmark_runs, variants,
+            args.benchmark_args.split() if args.benchmark_args else None, args.benchmark_report, **shared_options
+        )
+    elif args.watch:
+        if args.path is None:
+            parser.error("the following arguments are required: path")
+        try:
+            asyncio.run(watch_project(BuildConfig(**_options_from_args(args)), args.watch_debounce, args.watch_poll))
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+        except ValueError as e:
+            print(f"An error occurred: {str(e)}")
+            sys.exit(1)
+    elif args.wizard:
         # Run the wizard without requiring the path
         wizard()
     else:
         if args.path is None:
             parser.error("the following arguments are required: path")
         else:
+            if args.profile_imports:
+                try:
+                    profile = profile_imports(
+                        args.path, args.directory, args.profile_imports_runs,
+                        args.profile_imports_args.split() if args.profile_imports_args else None,
+                    )
+                except (ValueError, OSError, subprocess.SubprocessError) as e:
+                    print(f"An error occurred: {str(e)}")
+                    sys.exit(1)
+                print_import_profile(profile, write_import_profile(profile, args.profile_imports_report))
+                print(f"Import profile written to {args.profile_imports_report}")
             # Proceed with the normal packaging process using args.path
-            package_project(
-                args.path, args.directory, args.output_dir, args.include, args.pyinstaller_args, args.output_name,
-                args.clean, args.icon, args.hidden_imports, args.version, args.binaries, args.license, args.env_vars,
-                args.python, args.compress, args.hooks, args.bootloader, args.manifest, args.splash, args.runtime_hooks,
-                args.exe_format, args.system_path, args.upx_level, args.eula, args.spec_file, args.runtime_hook_spec,
-                args.template, args.compile_pyc, args.icon_mac, args.package_data, args.build_mode, args.custom_hooks,
-                args.custom_upx, args.bundle_stdlib, args.exclude, args.bootloader_conf, args.verbose,
-                args.external_modules, args.bundled_icon, args.temp_dir, args.upx_conf, args.resource_files, args.app_name,
-                args.log_dir, args.app_version, args.additional_files, args.user_hooks, args.file_version,
-                args.custom_library, args.upx_path, args.no_confirm, args.custom_commands, args.freeze_imports,
-                args.clean_build, args.warn_project_version, args.warn_no_version, args.name
-            )
+            package_project(**_options_from_args(args))
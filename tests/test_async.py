@@ -0,0 +1,67 @@
+import asyncio
+import os
+import threading
+import time
+
+import package
+
+
+def test_cancelled_build_waits_for_its_running_thread(monkeypatch):
+    events = []
+    started = threading.Event()
+
+    def slow_prepare(config):
+        events.append('prepare started')
+        started.set()
+        time.sleep(0.3)
+        events.append('prepare finished')
+        return None, {}
+
+    monkeypatch.setattr(package, '_prepare_build', slow_prepare)
+    config = package.BuildConfig(selected_path=os.path.abspath('tool.py'), is_directory=False)
+
+    async def main():
+        task = asyncio.ensure_future(package.package_project_async(config))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        events.append('task done')
+        return task
+
+    task = asyncio.run(main())
+    assert task.cancelled()
+    assert events == ['prepare started', 'prepare finished', 'task done']
+
+
+def test_write_json_from_many_threads(tmp_path):
+    path = str(tmp_path / 'data.json')
+    errors = []
+
+    def write(worker):
+        try:
+            for count in range(50):
+                package._write_json(path, {'worker': worker, 'count': count})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert package._read_json(path)['count'] == 49
+    assert os.listdir(tmp_path) == ['data.json']
+
+
+def test_record_cache_event_from_many_threads(tmp_path):
+    cache_dir = str(tmp_path)
+    threads = [
+        threading.Thread(target=lambda: [package._record_cache_event(cache_dir, 'hits') for _ in range(100)])
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert package._read_json(os.path.join(cache_dir, 'stats.json')) == {'hits': 800}
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+import package
+
+
+def write_manifest(root, text):
+    (root / 'a').mkdir()
+    (root / 'b').mkdir()
+    (root / 'a' / 'main.py').write_text("print('a')\n")
+    (root / 'b' / 'main.py').write_text("print('b')\n")
+    manifest = root / 'release.toml'
+    manifest.write_text(text)
+    return str(manifest)
+
+
+def test_batch_targets_get_isolated_directories(tmp_path):
+    manifest = write_manifest(tmp_path, '[defaults]\nicon = "app.ico"\n\n[[target]]\npath = "a/main.py"\ninclude = "data:data"\n')
+    [(name, options)] = package.load_batch_manifest(manifest)
+    assert name == 'main'
+    assert options['selected_path'] == str(tmp_path / 'a' / 'main.py')
+    assert options['output_dir'] == str(tmp_path / 'dist')
+    assert options['temp_dir'] == os.path.join(str(tmp_path), 'build', 'batch', 'main', 'work')
+    assert options['spec_file'] == os.path.join(str(tmp_path), 'build', 'batch', 'main', 'spec')
+    assert options['icon'] == str(tmp_path / 'app.ico')
+    assert options['include'] == f"{tmp_path / 'data'}:data"
+
+
+def test_batch_targets_with_the_same_file_name_get_their_own_artifact_name(tmp_path):
+    manifest = write_manifest(tmp_path, '[[target]]\npath = "a/main.py"\n\n[[target]]\npath = "b/main.py"\n')
+    (first_name, first), (second_name, second) = package.load_batch_manifest(manifest)
+    assert (first_name, second_name) == ('main', 'main-2')
+    assert 'name' not in first and second['name'] == 'main-2'
+    assert first['temp_dir'] != second['temp_dir']
+
+
+def test_batch_targets_in_separate_output_directories_keep_their_name(tmp_path):
+    manifest = write_manifest(
+        tmp_path, '[[target]]\npath = "a/main.py"\noutput_dir = "dist/a"\n\n[[target]]\npath = "b/main.py"\noutput_dir = "dist/b"\n'
+    )
+    (_, first), (second_name, second) = package.load_batch_manifest(manifest)
+    assert 'name' not in second
+    # The work and spec directories are still separate
+    assert second_name == 'main-2' and first['temp_dir'] != second['temp_dir']
+
+
+def test_batch_targets_with_the_same_explicit_name_are_rejected(tmp_path):
+    manifest = write_manifest(
+        tmp_path, '[[target]]\npath = "a/main.py"\nname = "tool"\n\n[[target]]\npath = "b/main.py"\nname = "tool"\n'
+    )
+    with pytest.raises(ValueError, match="#1 and #2 both build 'tool'"):
+        package.load_batch_manifest(manifest)
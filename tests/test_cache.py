@@ -0,0 +1,81 @@
+import os
+
+import package
+
+
+def make_project(root):
+    (root / 'mypkg' / 'build').mkdir(parents=True)
+    (root / 'app.py').write_text("import mypkg.build.steps\n")
+    (root / 'mypkg' / '__init__.py').write_text("")
+    (root / 'mypkg' / 'build' / 'steps.py').write_text("STEPS = 1\n")
+    (root / 'app.ico').write_bytes(b'icon-1')
+    return root
+
+
+def cache_key(root, **options):
+    skip_paths = [str(root / 'dist'), str(root / 'build')]
+    command = ["pyinstaller", "--onefile", str(root / 'app.py')]
+    return package.compute_cache_key(str(root), command, package._input_paths(options, str(root)), skip_paths)
+
+
+def test_cache_key_covers_nested_build_and_dist_packages(tmp_path):
+    root = make_project(tmp_path)
+    before = cache_key(root)
+    (root / 'mypkg' / 'build' / 'steps.py').write_text("STEPS = 2\n")
+    assert cache_key(root) != before
+
+
+def test_cache_key_ignores_the_build_outputs(tmp_path):
+    root = make_project(tmp_path)
+    before = cache_key(root)
+    (root / 'dist').mkdir()
+    (root / 'dist' / 'app').write_bytes(b'executable')
+    (root / 'build' / 'app').mkdir(parents=True)
+    (root / 'build' / 'app' / 'Analysis-00.toc').write_text("toc")
+    assert cache_key(root) == before
+
+
+def test_cache_key_covers_files_passed_as_options(tmp_path):
+    root = make_project(tmp_path)
+    outside = tmp_path.parent / f"{tmp_path.name}-hooks"
+    outside.mkdir()
+    (outside / 'hook-mypkg.py').write_text("hiddenimports = []\n")
+    options = {'icon': 'app.ico', 'hooks': str(outside), 'include': 'app.ico:assets'}
+    before = cache_key(root, **options)
+
+    (root / 'app.ico').write_bytes(b'icon-2')
+    after_icon = cache_key(root, **options)
+    assert after_icon != before
+
+    (outside / 'hook-mypkg.py').write_text("hiddenimports = ['json']\n")
+    assert cache_key(root, **options) != after_icon
+
+
+def store_artifact(tmp_path, cache_dir, key, content, max_size=None):
+    dist = tmp_path / f"dist-{key}"
+    (dist / 'app').mkdir(parents=True)
+    (dist / 'app' / 'app').write_bytes(content)
+    package.store_in_cache(str(cache_dir), key, [str(dist / 'app')], max_size)
+
+
+def test_store_and_restore(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    store_artifact(tmp_path, cache_dir, 'k1', b'built once')
+    target = tmp_path / 'restored'
+    assert package.restore_from_cache(str(cache_dir), 'missing', str(target)) is None
+    restored = package.restore_from_cache(str(cache_dir), 'k1', str(target))
+    assert restored == [str(target / 'app')]
+    assert (target / 'app' / 'app').read_bytes() == b'built once'
+    stats = package._read_json(os.path.join(cache_dir, 'stats.json'))
+    assert (stats['hits'], stats['misses'], stats['stores']) == (1, 1, 1)
+
+
+def test_eviction_removes_least_recently_used_entries(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    store_artifact(tmp_path, cache_dir, 'old', b'x' * 100)
+    store_artifact(tmp_path, cache_dir, 'used', b'y' * 100)
+    # Restoring an entry makes it the most recently used one
+    package.restore_from_cache(str(cache_dir), 'old', str(tmp_path / 'restored'))
+    store_artifact(tmp_path, cache_dir, 'new', b'z' * 100, max_size=250)
+    assert sorted(entry['key'] for entry in package._cache_entries(str(cache_dir))) == ['new', 'old']
+    assert package._read_json(os.path.join(cache_dir, 'stats.json'))['evictions'] == 1
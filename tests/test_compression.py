@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pytest
+
+import package
+
+
+@pytest.mark.parametrize('binary, policy, upx, strip, expected', [
+    ({'format': 'elf', 'path': 'lib.so', 'size': 10}, 'min-size', True, True, ['strip', 'upx']),
+    ({'format': 'elf', 'path': 'lib.so', 'size': 10}, 'min-startup', True, True, ['strip']),
+    ({'format': 'elf', 'path': 'lib.so', 'size': 10}, 'balanced', True, True, ['strip', 'upx']),
+    ({'format': 'elf', 'path': 'big.so', 'size': 2 * 1024 * 1024}, 'balanced', True, True, ['strip']),
+    ({'format': 'elf', 'path': 'lib.so', 'size': 10}, 'min-size', False, False, []),
+    ({'format': 'pe', 'path': 'tool.dll', 'size': 10}, 'min-size', True, True, ['upx']),
+    ({'format': 'pe', 'path': 'VCRUNTIME140.dll', 'size': 10}, 'min-size', True, True, []),
+    ({'format': 'macho', 'path': 'lib.dylib', 'size': 10}, 'min-size', True, True, []),
+    ({'format': None, 'path': 'data.txt', 'size': 10}, 'min-size', True, True, []),
+])
+def test_plan_compression(binary, policy, upx, strip, expected):
+    assert package.plan_compression(binary, policy, upx, strip) == expected
+
+
+def make_config(**options):
+    return package.BuildConfig(selected_path=os.path.abspath('tool.py'), is_directory=False, **options)
+
+
+def test_build_command_compression_policy(monkeypatch):
+    monkeypatch.setattr(package.platform, 'system', lambda: 'Linux')
+    onefile = package.build_command(make_config(compression_policy='min-size'))
+    assert "--noupx" not in onefile and "--strip" in onefile
+    onedir = package.build_command(make_config(exe_format='directory', compression_policy='min-size'))
+    # Onedir binaries are compressed one by one after the build
+    assert "--noupx" in onedir and "--strip" not in onedir
+
+
+def make_tool(path, script):
+    path.write_text(f"#!/bin/sh\n{script}\n")
+    path.chmod(0o755)
+    return str(path)
+
+
+def test_compression_tools_respect_no_compress(tmp_path):
+    upx = make_tool(tmp_path / 'upx', '')
+    assert package._compression_tools(make_config(upx_path=upx))['upx'] == upx
+    assert package._compression_tools(make_config(upx_path=upx, compress=False))['upx'] is None
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="the fake tools are shell scripts")
+def test_cached_binaries_report_the_actions_that_applied(tmp_path):
+    # UPX packs the binary, but its self-test fails, so the packed output is discarded
+    upx = make_tool(tmp_path / 'upx', 'for arg; do [ "$arg" = -t ] && exit 1; file="$arg"; done\necho packed >> "$file"')
+    tools = {'strip': make_tool(tmp_path / 'strip', 'exit 0'), 'upx': upx, 'upx_level': None}
+    binary = tmp_path / 'lib.so'
+    binary.write_bytes(b'\x7fELF library')
+    cache_dir = str(tmp_path / 'cache')
+
+    first = package._compress_binary(str(binary), ['strip', 'upx'], tools, cache_dir)
+    assert (first['actions'], first['cached']) == (['strip'], False)
+    assert binary.read_bytes() == b'\x7fELF library'
+    second = package._compress_binary(str(binary), ['strip', 'upx'], tools, cache_dir)
+    assert (second['actions'], second['cached']) == (['strip'], True)
+
+    package.evict_cache(cache_dir, 0)
+    assert os.listdir(os.path.join(cache_dir, 'compressed', os.listdir(os.path.join(cache_dir, 'compressed'))[0])) == []
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+import package
+
+
+@pytest.fixture
+def linux(monkeypatch):
+    monkeypatch.setattr(package.platform, 'system', lambda: 'Linux')
+
+
+def make_config(**options):
+    options.setdefault('selected_path', os.path.abspath('tool.py'))
+    options.setdefault('is_directory', False)
+    return package.BuildConfig(**options)
+
+
+def test_build_command_defaults(linux):
+    command = package.build_command(make_config())
+    assert command[:2] == ["pyinstaller", "--onefile"]
+    assert command[command.index("--name") + 1] == "tool"
+    assert command[-2:] == [os.path.abspath('tool.py'), "--noconfirm"]
+
+
+def test_build_command_directory_format_and_options(linux):
+    command = package.build_command(make_config(exe_format='directory', compress=False, optimize=2))
+    assert "--onedir" in command
+    assert "--noupx" in command
+    assert command[command.index("--optimize") + 1] == "2"
+
+
+def test_from_dict_resolves_every_path_against_base_dir(tmp_path):
+    base_dir = str(tmp_path)
+    config = package.BuildConfig.from_dict({
+        'path': 'app.py', 'icon': 'assets/app.ico', 'hooks': 'hooks', 'output_dir': 'out',
+        'include': 'data:data', 'additional_files': 'extra/readme.txt:.', 'upx_path': '/opt/upx',
+    }, base_dir)
+    assert config.selected_path == os.path.join(base_dir, 'app.py') and config.is_directory is False
+    assert config.icon == os.path.join(base_dir, 'assets/app.ico')
+    assert config.hooks == os.path.join(base_dir, 'hooks')
+    assert config.output_dir == os.path.join(base_dir, 'out')
+    assert config.include == f"{os.path.join(base_dir, 'data')}:data"
+    assert config.additional_files == f"{os.path.join(base_dir, 'extra/readme.txt')}:."
+    assert config.upx_path == '/opt/upx'
+
+
+def test_from_dict_without_base_dir_keeps_paths():
+    config = package.BuildConfig.from_dict({'path': 'app.py', 'directory': False, 'icon': 'app.ico'})
+    assert (config.selected_path, config.icon) == ('app.py', 'app.ico')
+
+
+def test_from_dict_rejects_unknown_options():
+    with pytest.raises(ValueError, match="Unknown build options: colour"):
+        package.BuildConfig.from_dict({'path': 'app.py', 'colour': 'blue'})
+
+
+def test_from_file_is_relative_to_the_file(tmp_path):
+    (tmp_path / 'tools').mkdir()
+    config_file = tmp_path / 'tools' / 'build.json'
+    config_file.write_text('{"path": "app.py", "icon": "app.ico", "exe_format": "directory"}')
+    config = package.BuildConfig.from_file(str(config_file))
+    assert config.selected_path == str(tmp_path / 'tools' / 'app.py')
+    assert config.icon == str(tmp_path / 'tools' / 'app.ico')
+    assert config.exe_format == 'directory'
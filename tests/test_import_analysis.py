@@ -0,0 +1,110 @@
+import os
+
+import package
+
+
+def test_parse_imports():
+    source = "\n".join([
+        "import os, json.decoder",
+        "from . import sibling",
+        "from pkg.sub import name",
+        "from star import *",
+        "import importlib",
+        "importlib.import_module('plugins.fast')",
+        "__import__('legacy')",
+        "importlib.import_module('.relative', __package__)",
+        "importlib.import_module('backends.' + name)",
+        "importlib.import_module(f'drivers.{name}')",
+    ])
+    result = package._parse_imports(source, 'example.py')
+    assert ['os', 0] in result['imports']
+    assert ['json.decoder', 0] in result['imports']
+    assert ['sibling', 1] in result['imports']
+    assert ['pkg.sub', 0] in result['imports'] and ['pkg.sub.name', 0] in result['imports']
+    assert ['star', 0] in result['imports'] and ['star.*', 0] not in result['imports']
+    assert result['dynamic'] == ['plugins.fast', 'legacy']
+    assert result['prefixes'] == ['backends.', 'drivers.']
+    assert result['guarded'] == []
+
+
+def test_parse_imports_reports_syntax_errors():
+    result = package._parse_imports("def broken(:\n", 'broken.py')
+    assert result['imports'] == [] and 'error' in result
+
+
+def test_parse_imports_marks_guarded_imports():
+    source = "\n".join([
+        "try:",
+        "    import ujson as json",
+        "    from simplejson import loads",
+        "except ImportError:",
+        "    import json",
+        "try:",
+        "    import yaml",
+        "except (ValueError, ModuleNotFoundError):",
+        "    yaml = None",
+        "try:",
+        "    import toml",
+        "except KeyError:",
+        "    pass",
+        "import simplejson.scanner",
+    ])
+    result = package._parse_imports(source, 'example.py')
+    # simplejson is also imported unguarded, and only ImportError handlers make an import optional
+    assert result['guarded'] == ['ujson', 'yaml']
+
+
+def make_distribution(modules, sources=(), requires=(), size=10):
+    return {'name': modules[0], 'modules': set(modules), 'sources': list(sources), 'requires': list(requires), 'size': size}
+
+
+def test_analyze_imports_excludes_packages_dependencies_import_optionally(tmp_path, monkeypatch):
+    project = tmp_path / 'project'
+    project.mkdir()
+    (project / 'app.py').write_text("import dep\n")
+    dependency = tmp_path / 'site-packages' / 'dep' / '__init__.py'
+    dependency.parent.mkdir(parents=True)
+    dependency.write_text("import needed\ntry:\n    import heavy\nexcept ImportError:\n    heavy = None\n")
+    big = 2 * package.DEFAULT_MIN_EXCLUDE_SIZE
+    distributions = {
+        'dep': make_distribution(['dep'], [str(dependency)]),
+        'needed': make_distribution(['needed'], size=big),
+        'heavy': make_distribution(['heavy'], size=big),
+        'unrelated': make_distribution(['unrelated'], size=big),
+    }
+    monkeypatch.setattr(package, '_installed_distributions', lambda: distributions)
+
+    analysis = package.analyze_imports(str(project / 'app.py'), False, str(tmp_path / 'cache'))
+    assert analysis['reachable'] == ['dep', 'needed']
+    # PyInstaller never collects 'unrelated', so excluding it would prune nothing
+    assert analysis['excludes'] == ['heavy']
+
+    cached = package.analyze_imports(str(project / 'app.py'), False, str(tmp_path / 'cache'))
+    assert cached['excludes'] == ['heavy'] and cached['parsed'] == 0
+
+
+def test_collected_sizes_reads_the_analysis_toc(tmp_path):
+    (tmp_path / 'heavy').mkdir()
+    (tmp_path / 'heavy' / '__init__.py').write_bytes(b'x' * 100)
+    (tmp_path / 'heavy' / '_core.so').write_bytes(b'x' * 1000)
+    (tmp_path / 'heavy.dat').write_bytes(b'x' * 10)
+    pure = [('heavy', str(tmp_path / 'heavy' / '__init__.py'), 'PYMODULE')]
+    binaries = [('heavy/_core.so', str(tmp_path / 'heavy' / '_core.so'), 'EXTENSION')]
+    datas = [
+        ('heavy/data/heavy.dat', str(tmp_path / 'heavy.dat'), 'DATA'),
+        ('gone/file.txt', str(tmp_path / 'missing.txt'), 'DATA'),
+    ]
+    toc = tmp_path / 'Analysis-00.toc'
+    toc.write_text(repr((['app.py'], [str(tmp_path)], ['heavy'], pure, binaries, datas)))
+    assert package.collected_sizes(str(toc)) == {'heavy': 1110}
+    assert package.collected_sizes(str(tmp_path / 'absent.toc')) is None
+
+
+def test_build_command_applies_analysis(monkeypatch):
+    monkeypatch.setattr(package.platform, 'system', lambda: 'Linux')
+    analysis = {'hidden_imports': ['plugins.a'], 'collect_submodules': ['plugins'], 'excludes': ['tkinter']}
+    config = package.BuildConfig(selected_path=os.path.abspath('tool.py'), is_directory=False)
+    command = package.build_command(config, analysis)
+    assert command[command.index("--hidden-import") + 1] == "plugins.a"
+    assert command[command.index("--collect-submodules") + 1] == "plugins"
+    assert command[command.index("--exclude-module") + 1] == "tkinter"
@@ -0,0 +1,48 @@
+import sys
+
+import pytest
+
+import package
+
+
+def test_parse_importtime():
+    output = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |     encodings.aliases",
+        "import time:       300 |        420 |   encodings",
+        "import time:        80 |         80 |   json.decoder",
+        "import time:       500 |       1000 | app",
+        "some other stderr line",
+        "import time:        10 |         10 | site",
+    ])
+    records = {record['module']: record for record in package.parse_importtime(output)}
+    assert list(records) == ['encodings.aliases', 'encodings', 'json.decoder', 'app', 'site']
+    assert records['app'] == {'module': 'app', 'self': 500, 'cumulative': 1000, 'level': 0, 'importer': None}
+    assert records['encodings.aliases']['level'] == 2
+    assert records['encodings.aliases']['importer'] == 'encodings'
+    assert records['encodings']['importer'] == 'app'
+    assert records['json.decoder']['importer'] == 'app'
+    assert records['site']['importer'] is None
+
+
+@pytest.fixture
+def without_stdlib_module_names(monkeypatch):
+    # Python 3.8 and 3.9 have no sys.stdlib_module_names
+    if hasattr(sys, 'stdlib_module_names'):
+        monkeypatch.delattr(sys, 'stdlib_module_names')
+    package._is_stdlib_module.cache_clear()
+    yield
+    package._is_stdlib_module.cache_clear()
+
+
+@pytest.mark.parametrize('module, stdlib', [
+    ('json', True), ('os', True), ('sys', True), ('_socket', True), ('email', True),
+    ('pytest', False), ('no_such_module_here', False),
+])
+def test_stdlib_modules_without_stdlib_module_names(without_stdlib_module_names, module, stdlib):
+    assert package._is_stdlib_module(module) is stdlib
+
+
+def test_installed_packages_without_stdlib_module_names(without_stdlib_module_names):
+    assert not package._is_installed_package('json.decoder')
+    assert package._is_installed_package('pytest')
@@ -0,0 +1,58 @@
+import os
+
+import package
+
+
+def test_plan_incremental_build(tmp_path):
+    source = tmp_path / 'src'
+    source.mkdir()
+    (source / 'app.py').write_text("print('hello')\n")
+    (source / 'util.py').write_text("VALUE = 1\n")
+    work_dir = str(tmp_path / 'work')
+    command = ["pyinstaller", "--onedir", str(source / 'app.py')]
+
+    plan = package.plan_incremental_build(work_dir, command, [str(source)], [])
+    assert not plan['reuse'] and plan['reason'] == "no previous build"
+    package.finish_incremental_build(work_dir, plan, 1.0)
+
+    plan = package.plan_incremental_build(work_dir, command, [str(source)], [])
+    assert plan['reuse'] and plan['changed'] == []
+
+    (source / 'util.py').write_text("VALUE = 22\n")
+    plan = package.plan_incremental_build(work_dir, command, [str(source)], [])
+    assert plan['reuse'] and plan['changed'] == [str(source / 'util.py')]
+    package.finish_incremental_build(work_dir, plan, 0.5)
+
+    plan = package.plan_incremental_build(work_dir, command + ["--debug", "all"], [str(source)], [])
+    assert not plan['reuse'] and plan['reason'] == "PyInstaller options changed"
+
+    (source / 'util.py').unlink()
+    plan = package.plan_incremental_build(work_dir, command, [str(source)], [])
+    assert not plan['reuse'] and plan['reason'] == "1 file(s) removed"
+
+def make_work_dir(cache_dir, name, size, last_used):
+    work_dir = cache_dir / 'work' / name
+    (work_dir / 'app').mkdir(parents=True)
+    (work_dir / 'app' / 'PYZ-00.pyz').write_bytes(b'x' * size)
+    os.utime(work_dir, (last_used, last_used))
+    return work_dir
+
+
+def test_work_dirs_count_towards_the_cache_size(tmp_path, capsys):
+    cache_dir = tmp_path / 'cache'
+    old = make_work_dir(cache_dir, 'old', 100, 1000)
+    recent = make_work_dir(cache_dir, 'recent', 100, 2000)
+    package.print_cache_stats(str(cache_dir))
+    assert "Work dirs: 2 projects" in capsys.readouterr().out
+
+    package.evict_cache(str(cache_dir), 150)
+    assert not old.exists() and recent.exists()
+    assert package._read_json(os.path.join(cache_dir, 'stats.json'))['evictions'] == 1
+
+
+def test_planning_a_build_marks_its_work_dir_as_used(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    work_dir = make_work_dir(cache_dir, 'project', 10, 1000)
+    (tmp_path / 'app.py').write_text("print('hello')\n")
+    package.plan_incremental_build(str(work_dir), ["pyinstaller", str(tmp_path / 'app.py')], [str(tmp_path / 'app.py')], [])
+    assert os.stat(work_dir).st_mtime > 1000
@@ -0,0 +1,52 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import package
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="lazy onefile executables need /bin/sh")
+
+
+def make_tree(root, names):
+    (root / '_internal').mkdir(parents=True)
+    executable = root / root.name
+    executable.write_text('#!/bin/sh\necho "ran $0"\n')
+    executable.chmod(0o755)
+    for name in names:
+        (root / '_internal' / name).write_bytes(name.encode() * 10)
+    return root
+
+
+def test_entry_name_does_not_depend_on_directory_order(tmp_path, monkeypatch):
+    first = make_tree(tmp_path / 'one' / 'app', ['a.so', 'b.so', 'c.dat'])
+    second = make_tree(tmp_path / 'two' / 'app', ['c.dat', 'b.so', 'a.so'])
+    walk = os.walk
+
+    def reversed_walk(root):
+        for dirpath, dirnames, filenames in walk(root):
+            yield dirpath, dirnames, list(reversed(filenames))
+
+    a = package.build_lazy_onefile(str(first), str(tmp_path / 'one.bin'), mtime=0)
+    monkeypatch.setattr(package.os, 'walk', reversed_walk)
+    b = package.build_lazy_onefile(str(second), str(tmp_path / 'two.bin'), mtime=0)
+    assert a['entry'] == b['entry']
+    assert (tmp_path / 'one.bin').read_bytes() == (tmp_path / 'two.bin').read_bytes()
+
+
+def test_launcher_recovers_from_a_deleted_entry(tmp_path):
+    tree = make_tree(tmp_path / 'build' / 'app', ['lib.so'])
+    executable = tmp_path / 'app.bin'
+    stats = package.build_lazy_onefile(str(tree), str(executable))
+    env = dict(os.environ, XDG_CACHE_HOME=str(tmp_path / 'cache'))
+    entry = tmp_path / 'cache' / 'kpypackager' / 'lazy' / stats['entry']
+
+    assert subprocess.run([str(executable)], env=env, capture_output=True, text=True).stdout.startswith("ran ")
+    assert entry.is_symlink()
+    # Deleting the unpacked tree leaves a dangling symlink behind
+    shutil.rmtree(entry.resolve())
+    completed = subprocess.run([str(executable)], env=env, capture_output=True, text=True)
+    assert completed.returncode == 0 and completed.stdout.startswith("ran ")
+    assert entry.resolve().is_dir()
@@ -0,0 +1,43 @@
+import importlib.util
+import os
+
+import package
+
+
+def test_precompile_writes_timestamp_pycs_and_reuses_the_cache(tmp_path):
+    source = tmp_path / 'src' / 'module.py'
+    source.parent.mkdir()
+    source.write_text("VALUE = 1\n")
+    cache_dir = str(tmp_path / 'cache')
+
+    stats = package.precompile_bytecode([str(source)], 2, cache_dir, jobs=1)
+    assert (stats['compiled'], stats['reused'], stats['failed']) == (1, 0, 0)
+    pyc_path = importlib.util.cache_from_source(str(source), optimization=2)
+    with open(pyc_path, 'rb') as f:
+        header = f.read(16)
+    # Flags 0: validated by the source's mtime and size, not by hashing it on every import
+    assert header[:4] == importlib.util.MAGIC_NUMBER and header[4:8] == b'\0\0\0\0'
+
+    assert package.precompile_bytecode([str(source)], 2, cache_dir, jobs=1)['current'] == 1
+    os.remove(pyc_path)
+    assert package.precompile_bytecode([str(source)], 2, cache_dir, jobs=1)['reused'] == 1
+
+
+def test_precompile_reports_compile_errors(tmp_path):
+    broken = tmp_path / 'broken.py'
+    broken.write_text("def broken(:\n")
+    stats = package.precompile_bytecode([str(broken)], 0, str(tmp_path / 'cache'), jobs=1)
+    assert stats['failed'] == 1 and str(broken) in stats['errors']
+
+
+def test_pyc_cache_is_evicted_with_the_build_cache(tmp_path):
+    sources = []
+    for number in range(3):
+        source = tmp_path / f"module{number}.py"
+        source.write_text(f"VALUE = {'x' * 200!r}\n")
+        sources.append(str(source))
+    cache_dir = str(tmp_path / 'cache')
+    package.precompile_bytecode(sources, 0, cache_dir, jobs=1)
+    assert len(package._cache_objects(cache_dir, 'pyc')) == 3
+    package.evict_cache(cache_dir, 1)
+    assert package._cache_objects(cache_dir, 'pyc') == []
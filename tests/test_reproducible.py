@@ -0,0 +1,42 @@
+import os
+
+import package
+
+
+def manifest(**files):
+    return {'files': {name: {'sha256': digest, 'size': size, 'mode': 0o644} for name, (digest, size) in files.items()}}
+
+
+def test_diff_manifests():
+    old = manifest(same=('a', 1), changed=('b', 10), removed=('c', 5))
+    new = manifest(same=('a', 1), changed=('d', 30), added=('e', 7))
+    diff = package.diff_manifests(old, new)
+    assert diff['added'] == ['added']
+    assert diff['removed'] == ['removed']
+    assert [change['file'] for change in diff['changed']] == ['changed']
+    assert diff['identical'] == 1
+    assert diff['ship_bytes'] == 37
+
+
+def test_diff_manifests_of_identical_artifacts(tmp_path):
+    (tmp_path / 'app').mkdir()
+    (tmp_path / 'app' / 'lib.so').write_bytes(b'\0elf')
+    first = package.artifact_manifest(str(tmp_path / 'app'))
+    second = package.artifact_manifest(str(tmp_path / 'app'))
+    diff = package.diff_manifests(first, second)
+    assert (diff['added'], diff['removed'], diff['changed'], diff['identical']) == ([], [], [], 1)
+
+
+def test_scrub_build_paths_leaves_user_data_alone(tmp_path):
+    artifact = tmp_path / 'app'
+    metadata = artifact / '_internal' / 'tool-1.0.dist-info'
+    metadata.mkdir(parents=True)
+    (metadata / 'direct_url.json').write_text(f'{{"url": "file://{tmp_path}/src"}}')
+    (artifact / '_internal' / 'links.txt').write_text(f"https://example.com/a {tmp_path}/src")
+    stats = package.scrub_build_paths(str(artifact), ['/', str(tmp_path)])
+    assert stats == {
+        'scrubbed': [os.path.join('_internal', 'tool-1.0.dist-info', 'direct_url.json')],
+        'leaks': [os.path.join('_internal', 'links.txt')],
+    }
+    assert str(tmp_path) not in (metadata / 'direct_url.json').read_text()
+    assert (artifact / '_internal' / 'links.txt').read_text() == f"https://example.com/a {tmp_path}/src"